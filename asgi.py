@@ -0,0 +1,258 @@
+# Асинхронный режим: uvicorn asgi:app --port 8080
+# JSON API работ и пользователей обслуживается здесь на aiosqlite, пока
+# запрос ждёт базу, цикл событий принимает другие соединения. Остальное
+# (HTML-страницы, пакетные операции, выгрузка NDJSON, регистрация через API
+# с хешированием пароля) уходит в приложение Flask через WsgiToAsgi.
+import json
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from werkzeug.datastructures import Accept, MIMEAccept
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags, quote_etag, unquote_etag
+
+import main
+from data import compression, db_session, jobs_api, metrics, users_resource
+from data.conditional import is_not_modified, row_validators, table_validators
+from data.export import NDJSON_MIMETYPE
+from data.serializers import dumps
+
+ROUTES = []
+
+state = {}
+# переопределения настроек create_app (например, из bench.server)
+config = {}
+
+
+def route(method, pattern):
+    def decorator(handler):
+        ROUTES.append((method, re.compile(pattern + '$'), handler))
+        return handler
+    return decorator
+
+
+class HTTPError(Exception):
+    def __init__(self, status, data):
+        super().__init__(status, data)
+        self.status = status
+        self.data = data
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope['query_string']
+        # как у request.args: при повторе параметра берётся первое значение
+        self.args = {}
+        for key, value in parse_qsl(self.query_string.decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(key, value)
+        self.headers = {key.decode('latin-1').lower(): value.decode('latin-1')
+                        for key, value in scope['headers']}
+        self.body = body
+
+    def wants_ndjson(self):
+        accept = parse_accept_header(self.headers.get('accept'), MIMEAccept)
+        return accept.best == NDJSON_MIMETYPE
+
+    def json(self):
+        if not self.body:
+            return None
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, {'error': 'Bad request'})
+
+
+def json_response(data, status=200, headers=()):
+    return status, [(b'content-type', b'application/json')] + list(headers), dumps(data)
+
+
+async def conditional_response(request, session, validators, build):
+    # то же, что data.conditional.conditional_response, без контекста Flask
+    etag, last_modified = await session.run_sync(validators)
+    headers = [(b'etag', quote_etag(etag).encode()),
+               (b'last-modified', http_date(last_modified).encode())]
+    if is_not_modified(etag, last_modified, parse_etags(request.headers.get('if-none-match')),
+                       parse_date(request.headers.get('if-modified-since'))):
+        return 304, headers, b''
+    data = await session.run_sync(build)
+    return json_response(data, headers=headers)
+
+
+@route('GET', r'/api/jobs')
+async def get_jobs(request, session):
+    if request.wants_ndjson():
+        return None
+
+    def build(db_sess):
+        try:
+            page = jobs_api.list_jobs(db_sess, request.args)
+        except ValueError:
+            return {'error': 'Bad request'}
+        if page['next'] is not None:
+            page['next'] = '/api/jobs?' + urlencode(page['next'])
+        return page
+
+    return await conditional_response(
+        request, session,
+        lambda db_sess: table_validators(db_sess, 'jobs', 'users', extra=(request.query_string,)),
+        build)
+
+
+@route('GET', r'/api/jobs/(\d+)')
+async def get_one_job(request, session, job_id):
+    return await conditional_response(
+        request, session,
+        lambda db_sess: row_validators(db_sess, jobs_api.job_modified(db_sess, job_id),
+                                       'jobs', 'users', extra=(job_id,)),
+        lambda db_sess: jobs_api.get_job_record(db_sess, job_id))
+
+
+@route('POST', r'/api/jobs')
+async def create_job(request, session):
+    data = request.json()
+    return json_response(await session.run_sync(jobs_api.create_job_record, data))
+
+
+@route('PUT', r'/api/jobs/(\d+)')
+async def edit_job(request, session, job_id):
+    data = request.json()
+    return json_response(await session.run_sync(jobs_api.edit_job_record, job_id, data))
+
+
+@route('DELETE', r'/api/jobs/(\d+)')
+async def delete_job(request, session, job_id):
+    return json_response(await session.run_sync(jobs_api.delete_job_record, job_id))
+
+
+@route('GET', r'/api/v2/users')
+async def get_users(request, session):
+    if request.wants_ndjson():
+        return None
+    return await conditional_response(
+        request, session,
+        lambda db_sess: table_validators(db_sess, 'users', 'departments'),
+        users_resource.list_user_records)
+
+
+@route('GET', r'/api/v2/users/(\d+)')
+async def get_user(request, session, users_id):
+    def build(db_sess):
+        record = users_resource.get_user_record(db_sess, users_id)
+        if record is None:
+            raise HTTPError(404, {'message': users_resource.not_found_message(users_id)})
+        return record
+
+    return await conditional_response(
+        request, session,
+        lambda db_sess: row_validators(db_sess, users_resource.user_modified(db_sess, users_id),
+                                       'users', 'jobs', 'departments', extra=(users_id,)),
+        build)
+
+
+@route('DELETE', r'/api/v2/users/(\d+)')
+async def delete_user(request, session, users_id):
+    record = await session.run_sync(users_resource.delete_user_record, users_id)
+    if record is None:
+        raise HTTPError(404, {'message': users_resource.not_found_message(users_id)})
+    return json_response(record)
+
+
+def compress_response(request, response):
+    # то же, что data.compression для ответов Flask
+    status, headers, payload = response
+    headers = headers + [(b'vary', b'Accept-Encoding')]
+    encoding = compression.negotiate(parse_accept_header(request.headers.get('accept-encoding'), Accept))
+    etag_index = next((i for i, (name, value) in enumerate(headers) if name == b'etag'), None)
+    etag = unquote_etag(headers[etag_index][1].decode())[0] if etag_index is not None else None
+    if encoding is None:
+        return status, headers, payload
+    if status == 304:
+        if etag and parse_etags(request.headers.get('if-none-match')).contains_weak(
+                compression.encoded_etag(etag, encoding)):
+            headers[etag_index] = (b'etag', quote_etag(compression.encoded_etag(etag, encoding)).encode())
+        return status, headers, payload
+    if status != 200 or len(payload) < state['flask'].config['COMPRESS_MIN_SIZE']:
+        return status, headers, payload
+    payload = compression.compressed_body(payload, encoding, (request.path, etag) if etag else None)
+    headers.append((b'content-encoding', encoding.encode()))
+    if etag:
+        headers[etag_index] = (b'etag', quote_etag(compression.encoded_etag(etag, encoding)).encode())
+    return status, headers, payload
+
+
+def match(scope):
+    for method, pattern, handler in ROUTES:
+        found = pattern.match(scope['path'])
+        if found and scope['method'] == method:
+            return handler, [int(value) for value in found.groups()]
+    return None, None
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            state['flask'] = main.create_app(**config)
+            state['wsgi'] = WsgiToAsgi(state['flask'])
+            state['engine'] = db_session.create_async_engine()
+            state['sessions'] = async_sessionmaker(state['engine'], expire_on_commit=False)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await state['engine'].dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    handler, params = match(scope) if scope['type'] == 'http' else (None, None)
+    if handler is None:
+        return await state['wsgi'](scope, receive, send)
+
+    body = await read_body(receive)
+    request = Request(scope, body)
+    stats = metrics.start_request(request.method, f'asgi.{handler.__name__}')
+    try:
+        async with state['sessions']() as session:
+            response = await handler(request, session, *params)
+    except HTTPError as error:
+        response = json_response(error.data, error.status)
+    except Exception:
+        metrics.finish_request()
+        raise
+    if response is None:
+        metrics.cancel_request()
+        # обработчик отказался (например, нужен потоковый ответ) - отдаём Flask,
+        # тело уже прочитано, поэтому передаём его заново
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        return await state['wsgi'](scope, replay, send)
+
+    status, headers, payload = compress_response(request, response)
+    stats.status = status
+    if state['flask'].config['SERVER_TIMING']:
+        headers.append((b'server-timing', stats.server_timing().encode()))
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': headers + [(b'content-length', str(len(payload)).encode())]})
+    await send({'type': 'http.response.body', 'body': payload})
+    metrics.finish_request()
@@ -0,0 +1,82 @@
+# Нагрузка на работающий сервер: много одновременных соединений, каждое
+# шлёт запросы по очереди (keep-alive). Сравнение режимов:
+#   python main.py                          # потоковый werkzeug, порт 8080
+#   uvicorn asgi:app --port 8080            # асинхронный режим
+#   python -m bench.concurrency --url http://127.0.0.1:8080/api/jobs?limit=20 -c 64
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+async def worker(host, port, requests, latencies, errors):
+    # requests - общий для всех соединений итератор (метод, путь, тело, заголовки)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for method, target, body, headers in requests:
+            head = ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+            start = time.perf_counter()
+            writer.write((f'{method} {target} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+                          f'Connection: keep-alive\r\nContent-Length: {len(body)}\r\n'
+                          f'{head}\r\n').encode() + body)
+            status = await reader.readline()
+            length, close = 0, False
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+                elif name.lower() == 'connection' and value.strip().lower() == 'close':
+                    close = True
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if status.split()[1:2] not in ([b'200'], [b'302'], [b'304']):
+                errors.append(status)
+            if close:
+                # сервер без keep-alive (werkzeug на HTTP/1.0) - новое соединение
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+    finally:
+        writer.close()
+
+
+def percentile(values, p):
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+async def load(host, port, requests, concurrency):
+    # (отсортированные задержки, ошибки, длительность)
+    latencies, errors = [], []
+    requests = iter(requests)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, requests, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return latencies, errors, elapsed
+
+
+async def run(url, concurrency, count):
+    parts = urlsplit(url)
+    target = parts.path + ('?' + parts.query if parts.query else '')
+    latencies, errors, elapsed = await load(parts.hostname, parts.port or 80,
+                                            (('GET', target, b'', {}) for _ in range(count)),
+                                            concurrency)
+    print(f'{len(latencies)} запросов, {concurrency} соединений, ошибок: {len(errors)}')
+    print(f'{len(latencies) / elapsed:.0f} запросов/с   '
+          + '   '.join(f'p{p}: {percentile(latencies, p) * 1000:.1f} мс' for p in (50, 95, 99)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:8080/api/jobs?limit=20')
+    parser.add_argument('-c', '--concurrency', type=int, default=64)
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.concurrency, args.requests))
+
+
+if __name__ == '__main__':
+    main()
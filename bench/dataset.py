@@ -0,0 +1,10 @@
+# Воспроизводимый набор данных для замеров: одинаковые размеры и seed дают
+# одинаковую базу. У всех пользователей пароль PASSWORD.
+from data import db_session, passwords
+from data.seed import PASSWORD, populate, user_email
+
+
+def seed(db_file, users=1000, jobs=20000, departments=50, seed=1, profile='bulk'):
+    db_session.global_init(db_file, profile)
+    passwords.configure(workers=0)
+    populate(db_session.get_engine(), users, jobs, departments, seed, log=lambda message: None)
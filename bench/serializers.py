@@ -0,0 +1,64 @@
+# Сравнение sqlalchemy_serializer.to_dict и скомпилированных сериализаторов.
+# Запуск: python -m bench.serializers --jobs 20000
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy_serializer import SerializerMixin as BaseSerializerMixin
+
+from data import db_session
+from data.jobs import Jobs
+from data.jobs_api import JOB_RULES
+from data.serializers import compile_serializer
+from data.users import User
+from data.users_resource import USER_LIST_RULES
+
+
+def seed(session, users, jobs):
+    session.add_all(User(surname=f'Surname {i}', name=f'Name {i}', age=20 + i % 40,
+                         position='engineer', speciality='builder', address=f'module_{i % 10}',
+                         email=f'user{i}@mars.org', hashed_password='x')
+                    for i in range(users))
+    session.flush()
+    now = datetime.datetime.now()
+    session.add_all(Jobs(team_leader=1 + i % users, job=f'job number {i}', work_size=i % 50,
+                         collaborators='1, 2', start_date=now, end_date=now,
+                         is_finished=bool(i % 2))
+                    for i in range(jobs))
+    session.commit()
+
+
+def measure(items, serialize):
+    start = time.perf_counter()
+    for item in items:
+        serialize(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--jobs', type=int, default=20000)
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    db_session.global_init(db_file)
+    session = db_session.create_session()
+    seed(session, args.users, args.jobs)
+
+    for model, rules in ((Jobs, JOB_RULES), (User, USER_LIST_RULES)):
+        # все строки и связи загружаются заранее, чтобы мерить только сериализацию
+        items = session.query(model).all()
+        for item in items:
+            BaseSerializerMixin.to_dict(item, rules=rules)
+        compiled = compile_serializer(model, rules)
+        base = measure(items, lambda item: BaseSerializerMixin.to_dict(item, rules=rules))
+        fast = measure(items, compiled)
+        print(f'{model.__name__:<6} to_dict: {base:>10.0f} rows/s   '
+              f'compiled: {fast:>10.0f} rows/s   x{fast / base:.1f}')
+
+
+if __name__ == '__main__':
+    main()
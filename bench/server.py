@@ -0,0 +1,58 @@
+# Сервер для замеров по HTTP: приложение на заданной базе, CSRF выключен,
+# чтобы сценарий входа мог отправлять форму без токена.
+#   python -m bench.server --db /tmp/bench.db --port 8099 --server gunicorn
+import argparse
+import os
+
+from main import create_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve_gunicorn(app, port, workers):
+    from gunicorn.app.base import Application
+
+    class Gunicorn(Application):
+        # настройки из gunicorn.conf.py, адрес и число процессов - из аргументов
+        def load_config(self):
+            self.load_config_from_file(os.path.join(ROOT, 'gunicorn.conf.py'))
+            self.cfg.set('bind', f'127.0.0.1:{port}')
+            if workers:
+                self.cfg.set('workers', workers)
+            self.cfg.set('accesslog', None)
+
+        def load(self):
+            return app
+
+    Gunicorn().run()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn', 'uvicorn'), default='werkzeug')
+    parser.add_argument('--workers', type=int, default=0)
+    args = parser.parse_args()
+
+    config = {'WTF_CSRF_ENABLED': False, 'DB_FILE': args.db}
+    if args.server == 'uvicorn':
+        import asgi
+        import uvicorn
+
+        # asgi.py сам вызывает create_app при запуске
+        asgi.config.update(config)
+        uvicorn.run(asgi.app, host='127.0.0.1', port=args.port, log_level='warning')
+        return
+    app = create_app(**config)
+    if args.server == 'gunicorn':
+        serve_gunicorn(app, args.port, args.workers)
+    else:
+        import logging
+
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        app.run(host='127.0.0.1', port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+# Набор замеров веб-части и API на воспроизводимых данных.
+#   python -m bench.suite --jobs 20000 --requests 500 --output bench-results.json
+#   python -m bench.suite --mode http --server gunicorn --compare bench-results.json
+# inprocess - последовательные запросы через test_client (стоимость кода
+# приложения без сети); http - сервер в отдельном процессе и --concurrency
+# одновременных keep-alive соединений.
+# Каждый сценарий работает на своей копии только что заполненной базы в
+# отдельном процессе, поэтому записи одного сценария не влияют на другие,
+# а результат не зависит от режима и порядка сценариев.
+import argparse
+import asyncio
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlencode
+
+from bench import dataset
+from bench.concurrency import load, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JSON_HEADERS = {'Content-Type': 'application/json'}
+FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+# сценарий: (rng, размеры данных) -> (метод, путь, тело, заголовки)
+SCENARIOS = {
+    'jobs_list': lambda rng, size: (
+        'GET', f'/api/jobs?limit=100&after={rng.randint(0, max(size.jobs - 100, 0))}', b'', {}),
+    'jobs_get': lambda rng, size: ('GET', f'/api/jobs/{rng.randint(1, size.jobs)}', b'', {}),
+    'jobs_post': lambda rng, size: ('POST', '/api/jobs', json.dumps({
+        'team_leader': rng.randint(1, size.users), 'job': 'bench job', 'work_size': rng.randint(1, 50),
+        'collaborators': f'{rng.randint(1, size.users)}, {rng.randint(1, size.users)}'}).encode(),
+        JSON_HEADERS),
+    'jobs_put': lambda rng, size: ('PUT', f'/api/jobs/{rng.randint(1, size.jobs)}', json.dumps({
+        'work_size': rng.randint(1, 50)}).encode(), JSON_HEADERS),
+    'users_list': lambda rng, size: ('GET', '/api/v2/users', b'', {}),
+    'users_get': lambda rng, size: ('GET', f'/api/v2/users/{rng.randint(1, size.users)}', b'', {}),
+    'index': lambda rng, size: ('GET', f'/index?page={rng.randint(1, 50)}', b'', {}),
+    'departments': lambda rng, size: ('GET', '/departments', b'', {}),
+    'login': lambda rng, size: ('POST', '/login', urlencode({
+        'email': dataset.user_email(rng.randint(1, size.users)),
+        'password': dataset.PASSWORD}).encode(), FORM_HEADERS),
+}
+
+
+def summary(scenario, mode, latencies, errors, elapsed, rss_mb, concurrency):
+    return {
+        'scenario': scenario,
+        'mode': mode,
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'throughput': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'peak_rss_mb': round(rss_mb, 1),
+    }
+
+
+def fresh_copy(pristine, name):
+    # копия заполненной базы для одного сценария рядом с исходной
+    path = os.path.join(os.path.dirname(pristine), f'{name}.db')
+    shutil.copyfile(pristine, path)
+    return path
+
+
+def remove_copy(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def inprocess_scenario(db_file, name, size, count, seed):
+    # выполняется в отдельном процессе: подключение к базе в приложении одно
+    # на процесс, и пик памяти меряется только для этого сценария
+    from main import create_app
+    from data import passwords
+
+    app = create_app(WTF_CSRF_ENABLED=False, DB_FILE=db_file)
+    rng = random.Random(seed)
+    requests = [SCENARIOS[name](rng, size) for _ in range(count)]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    try:
+        for method, path, body, headers in requests:
+            # новый клиент на каждый запрос: без cookie входа, как и по HTTP
+            began = time.perf_counter()
+            response = app.test_client().open(path, method=method, data=body, headers=headers)
+            latencies.append(time.perf_counter() - began)
+            if response.status_code not in (200, 302, 304):
+                errors.append(response.status_code)
+    finally:
+        # останавливает пул хэширования паролей: процесс сценария при выходе
+        # ждёт свои дочерние процессы
+        passwords.configure()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    # ru_maxrss в КиБ на Linux, пик за всё время процесса
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return summary(name, 'inprocess', latencies, errors, elapsed, rss, 1)
+
+
+def run_inprocess(pristine, scenarios, size, count, seed):
+    # не multiprocessing.Pool: его процессы - демоны и не могут запустить
+    # пул хэширования паролей, нужный сценарию login
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for name in scenarios:
+        db_file = fresh_copy(pristine, f'inprocess-{name}')
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results.append(executor.submit(inprocess_scenario, db_file, name, size, count,
+                                               seed).result())
+        finally:
+            remove_copy(db_file)
+        print_result(results[-1])
+    return results
+
+
+def process_tree(pid):
+    pids = [pid]
+    for task in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as file:
+                for child in file.read().split():
+                    pids.extend(process_tree(int(child)))
+        except FileNotFoundError:
+            pass
+    return pids
+
+
+def peak_rss_mb(pid):
+    # сумма VmHWM (пиковый RSS) сервера и его рабочих процессов
+    total = 0
+    for process in process_tree(pid):
+        try:
+            with open(f'/proc/{process}/status') as file:
+                for line in file:
+                    if line.startswith('VmHWM:'):
+                        total += int(line.split()[1])
+        except FileNotFoundError:
+            pass
+    return total / 1024
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('сервер завершился при запуске')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('сервер не запустился')
+
+
+def http_scenario(db_file, name, size, count, seed, server, port, concurrency, workers):
+    command = [sys.executable, '-m', 'bench.server', '--db', db_file, '--port', str(port),
+               '--server', server, '--workers', str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process)
+        rng = random.Random(seed)
+        requests = [SCENARIOS[name](rng, size) for _ in range(count)]
+        latencies, errors, elapsed = asyncio.run(load('127.0.0.1', port, requests, concurrency))
+        return summary(name, f'http-{server}', latencies, errors, elapsed,
+                       peak_rss_mb(process.pid), concurrency)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def run_http(pristine, scenarios, size, count, seed, server, port, concurrency, workers):
+    results = []
+    for name in scenarios:
+        db_file = fresh_copy(pristine, f'http-{name}')
+        try:
+            results.append(http_scenario(db_file, name, size, count, seed, server, port,
+                                         concurrency, workers))
+        finally:
+            remove_copy(db_file)
+        print_result(results[-1])
+    return results
+
+
+def print_result(result):
+    print(f"{result['mode']:<16} {result['scenario']:<12} {result['throughput']:>8.1f} req/s  "
+          f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  "
+          f"rss {result['peak_rss_mb']:>6.1f} MB  errors {result['errors']}")
+
+
+def compare(results, previous_file):
+    with open(previous_file, encoding='utf-8') as file:
+        previous = {(item['mode'], item['scenario']): item for item in json.load(file)['results']}
+    print(f'\nсравнение с {previous_file} (изменение, отрицательное для задержки - лучше):')
+    for result in results:
+        old = previous.get((result['mode'], result['scenario']))
+        if old is None:
+            continue
+        changes = []
+        for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb'):
+            if old[key]:
+                changes.append(f'{key} {(result[key] - old[key]) / old[key] * 100:+.1f}%')
+        print(f"{result['mode']:<16} {result['scenario']:<12} " + '  '.join(changes))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--jobs', type=int, default=20000)
+    parser.add_argument('--departments', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-n', '--requests', type=int, default=300)
+    parser.add_argument('-c', '--concurrency', type=int, default=16)
+    parser.add_argument('--mode', choices=('inprocess', 'http', 'all'), default='all')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn', 'uvicorn'), default='werkzeug')
+    parser.add_argument('--workers', type=int, default=0, help='рабочие процессы gunicorn')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'неизвестные сценарии: {", ".join(sorted(unknown))}')
+
+    db_file = os.path.join(tempfile.mkdtemp(prefix='mars-bench-'), 'bench.db')
+    started = time.perf_counter()
+    # HTTP-сервер - отдельный процесс, заполняем базу в дочернем, чтобы в
+    # этом процессе не оставалось открытых соединений и импортов приложения
+    subprocess.run([sys.executable, '-c',
+                    'import sys; from bench.dataset import seed; '
+                    'seed(sys.argv[1], *map(int, sys.argv[2:]))',
+                    db_file, str(args.users), str(args.jobs), str(args.departments), str(args.seed)],
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    print(f'данные: {args.users} пользователей, {args.jobs} работ, {args.departments} отделов '
+          f'за {time.perf_counter() - started:.1f} с ({db_file})')
+
+    results = []
+    if args.mode in ('http', 'all'):
+        results += run_http(db_file, scenarios, args, args.requests, args.seed, args.server,
+                            args.port, args.concurrency, args.workers)
+    if args.mode in ('inprocess', 'all'):
+        results += run_inprocess(db_file, scenarios, args, args.requests, args.seed)
+
+    report = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f'результаты: {args.output}')
+    if args.compare:
+        compare(results, args.compare)
+    # сценарий с ошибками меряет не то, что должен: не выдаём его за замер
+    failed = [f"{result['mode']} {result['scenario']} ({result['errors']})"
+              for result in results if result['errors']]
+    if failed:
+        print(f'ошибки в сценариях: {", ".join(failed)}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
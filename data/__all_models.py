@@ -1,3 +1,5 @@
 from . import users
 from . import jobs
-from . import departments
\ No newline at end of file
+from . import departments
+from . import associations
+from . import versions
@@ -0,0 +1,116 @@
+# Статика с отпечатками: url_for('static', filename='css/style.css') даёт
+# /static/css/style.1a2b3c4d5e.css, такой адрес кешируется браузером навсегда
+# (Cache-Control: immutable), при изменении файла меняется и адрес.
+# Сборка сжатых копий: python -m data.assets
+import hashlib
+import mimetypes
+import os
+
+from flask import abort, request, send_file
+
+from .compression import compress, negotiate, supported_encodings
+
+BUILD_FOLDER = 'dist'
+# содержимое этих папок уже адресуется хешем и меняется во время работы
+CONTENT_ADDRESSED = ('uploads', 'derived')
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def fingerprint(name, data):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+
+
+def scan(static_folder):
+    # {путь: путь с отпечатком} для всех файлов статики, кроме собранных
+    # и адресуемых хешем
+    manifest = {}
+    for folder, dirs, files in os.walk(static_folder):
+        relative = os.path.relpath(folder, static_folder)
+        if relative == '.':
+            dirs[:] = [name for name in dirs if name not in (BUILD_FOLDER,) + CONTENT_ADDRESSED]
+        for name in files:
+            path = os.path.join(folder, name)
+            key = os.path.normpath(os.path.join(relative, name)).replace(os.sep, '/')
+            with open(path, 'rb') as file:
+                manifest[key] = fingerprint(key, file.read())
+    return manifest
+
+
+def build(static_folder):
+    # сжатые копии текстовых файлов в static/dist под именами с отпечатком,
+    # устаревшие копии просто перестают находиться
+    manifest = scan(static_folder)
+    target = os.path.join(static_folder, BUILD_FOLDER)
+    os.makedirs(target, exist_ok=True)
+    for name, hashed in manifest.items():
+        if not name.endswith(COMPRESSIBLE):
+            continue
+        with open(os.path.join(static_folder, name), 'rb') as file:
+            data = file.read()
+        for encoding in supported_encodings():
+            body = compress(data, encoding, best=True)
+            # сжатая копия нужна, только если она действительно меньше
+            if len(body) < len(data):
+                path = os.path.join(target, hashed + SUFFIXES[encoding])
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as file:
+                    file.write(body)
+    return manifest
+
+
+def init_app(app):
+    # отпечатки считаются при запуске (в gunicorn с preload_app - один раз),
+    # поэтому адреса всегда соответствуют файлам на диске
+    manifest = scan(app.static_folder)
+    originals = {hashed: name for name, hashed in manifest.items()}
+    app.extensions['assets'] = manifest
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    def static(filename):
+        if filename in originals:
+            response = send_precompressed(app.static_folder, originals[filename], filename)
+        elif filename.split('/', 1)[0] in CONTENT_ADDRESSED:
+            response = app.send_static_file(filename)
+        else:
+            # старый адрес без отпечатка: обычная раздача с проверкой изменений
+            return app.send_static_file(filename)
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    app.view_functions['static'] = static
+
+
+def send_precompressed(static_folder, name, hashed):
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if name.endswith(COMPRESSIBLE):
+        paths = {encoding: os.path.join(static_folder, BUILD_FOLDER, hashed + suffix)
+                 for encoding, suffix in SUFFIXES.items()}
+        # собранные копии могли появиться и без brotli в текущем окружении
+        encoding = negotiate(request.accept_encodings,
+                             [encoding for encoding in SUFFIXES if os.path.exists(paths[encoding])])
+        if encoding is not None:
+            response = send_file(paths[encoding], mimetype=mimetype, conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+    path = os.path.join(static_folder, name)
+    if not os.path.isfile(path):
+        abort(404)
+    response = send_file(path, mimetype=mimetype, conditional=True)
+    if name.endswith(COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+if __name__ == '__main__':
+    static = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+    for name, hashed in sorted(build(static).items()):
+        print(f'{name} -> {hashed}')
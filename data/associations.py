@@ -0,0 +1,63 @@
+import sqlalchemy
+
+from .db_session import SqlAlchemyBase
+
+# Jobs.collaborators и Department.members хранятся строкой "2, 3" ради
+# совместимости API, а для поиска по участнику дублируются в эти таблицы
+job_collaborators = sqlalchemy.Table(
+    'job_collaborators', SqlAlchemyBase.metadata,
+    sqlalchemy.Column('job_id', sqlalchemy.Integer, sqlalchemy.ForeignKey('jobs.id'), primary_key=True),
+    sqlalchemy.Column('user_id', sqlalchemy.Integer, sqlalchemy.ForeignKey('users.id'), primary_key=True),
+    sqlalchemy.Index('ix_job_collaborators_user_job', 'user_id', 'job_id'),
+)
+
+department_members = sqlalchemy.Table(
+    'department_members', SqlAlchemyBase.metadata,
+    sqlalchemy.Column('department_id', sqlalchemy.Integer, sqlalchemy.ForeignKey('departments.id'),
+                      primary_key=True),
+    sqlalchemy.Column('user_id', sqlalchemy.Integer, sqlalchemy.ForeignKey('users.id'), primary_key=True),
+    sqlalchemy.Index('ix_department_members_user_department', 'user_id', 'department_id'),
+)
+
+
+def parse_ids(value):
+    # "2, 3" -> [2, 3]; нечисловые элементы и повторы пропускаются
+    ids = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if part.isdigit() and int(part) not in ids:
+            ids.append(int(part))
+    return ids
+
+
+def sync_ids(connection, table, owner_column, items):
+    # items: [(id владельца, строка id)], старые строки владельцев заменяются
+    items = list(items)
+    if not items:
+        return
+    owners = [owner_id for owner_id, _ in items]
+    connection.execute(table.delete().where(table.c[owner_column].in_(owners)))
+    rows = [{owner_column: owner_id, 'user_id': user_id}
+            for owner_id, value in items for user_id in parse_ids(value)]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def delete_ids(connection, table, owner_column, owners):
+    connection.execute(table.delete().where(table.c[owner_column].in_(list(owners))))
+
+
+def listen_id_list(model, attr, table, owner_column):
+    # поддерживает таблицу связей в актуальном состоянии при записи через ORM
+    @sqlalchemy.event.listens_for(model, 'after_insert')
+    def after_insert(mapper, connection, target):
+        sync_ids(connection, table, owner_column, [(target.id, getattr(target, attr))])
+
+    @sqlalchemy.event.listens_for(model, 'after_update')
+    def after_update(mapper, connection, target):
+        if sqlalchemy.inspect(target).attrs[attr].history.has_changes():
+            sync_ids(connection, table, owner_column, [(target.id, getattr(target, attr))])
+
+    @sqlalchemy.event.listens_for(model, 'after_delete')
+    def after_delete(mapper, connection, target):
+        delete_ids(connection, table, owner_column, [target.id])
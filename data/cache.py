@@ -0,0 +1,89 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteCache:
+    # общий для нескольких процессов кеш в отдельном файле SQLite,
+    # значения хранятся в JSON, интерфейс как у LRUCache
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                         '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)')
+
+    def _connect(self):
+        # соединение на поток; после fork соединение родителя не используется
+        pid, conn = getattr(self._local, 'conn', (None, None))
+        if conn is None or pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            self._local.conn = (os.getpid(), conn)
+        return conn
+
+    def get(self, key, default=None):
+        row = self._connect().execute('SELECT value, expires FROM cache WHERE key = ?',
+                                      (str(key),)).fetchone()
+        if row is None:
+            return default
+        value, expires = row
+        if expires is not None and expires < time.time():
+            self.delete(key)
+            return default
+        return json.loads(value)
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        self._connect().execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                                (str(key), json.dumps(value), expires))
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache WHERE key = ?', (str(key),))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
@@ -0,0 +1,95 @@
+import gzip
+
+from flask import request
+
+from .cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него только gzip
+    brotli = None
+
+DEFAULT_MIN_SIZE = 500  # меньшие тела после сжатия почти не уменьшаются
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/javascript',
+                      'application/json', 'application/javascript', 'image/svg+xml')
+
+# сжатое тело другое, поэтому и ETag другой: "<etag>-gzip", "<etag>-br"
+ENCODINGS = ('br', 'gzip')
+
+
+def encoded_etag(etag, encoding):
+    return f'{etag}-{encoding}'
+
+
+def compress(data, encoding, best=False):
+    # best - максимальное сжатие для тел, которые сжимаются один раз
+    # (статические страницы, сборка статики), иначе быстрое для ответов
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+# сжатые тела ответов с ETag: повторный запрос того же ответа не сжимается заново
+_cache = LRUCache(maxsize=256)
+
+
+def compressed_body(data, encoding, key=None):
+    # key - (путь, ETag) ответа; без ETag тело не запоминается
+    body = _cache.get((key, encoding)) if key else None
+    if body is None:
+        body = compress(data, encoding)
+        if key:
+            _cache.set((key, encoding), body)
+    return body
+
+
+def supported_encodings():
+    return tuple(encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None)
+
+
+def negotiate(accept_encodings, available=None):
+    # available - кодировки, в которых тело уже есть; по умолчанию все доступные.
+    # Берётся кодировка с наибольшим q (при равных - по порядку ENCODINGS);
+    # q=0 означает отказ, а `in` у Accept его не учитывает. None - без сжатия
+    best, best_quality = None, 0
+    for encoding in supported_encodings() if available is None else available:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)
+
+    @app.after_request
+    def compress_response(response):
+        if response.status_code == 304:
+            return not_modified(response)
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None or response.content_length < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        etag, weak = response.get_etag()
+        response.set_data(compressed_body(response.get_data(), encoding,
+                                          (request.path, etag) if etag else None))
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(encoded_etag(etag, encoding), weak=weak)
+        return response
+
+
+def not_modified(response):
+    # 304 должен нести тот же ETag, что и тело у клиента, то есть сжатый
+    etag, weak = response.get_etag()
+    encoding = negotiate(request.accept_encodings)
+    if etag and encoding and request.if_none_match.contains_weak(encoded_etag(etag, encoding)):
+        response.set_etag(encoded_etag(etag, encoding), weak=weak)
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,50 @@
+import hashlib
+from datetime import datetime, timezone
+
+from flask import make_response, request
+
+from .compression import ENCODINGS, encoded_etag
+from .versions import read_versions
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+
+def table_validators(session, *tables, extra=()):
+    # ETag и Last-Modified по версиям таблиц; extra - всё остальное, от чего
+    # зависит ответ (параметры запроса, id строки)
+    versions = read_versions(session, *tables)
+    modified = max((versions[table][1] for table in tables if table in versions), default=0)
+    etag = make_etag(sorted(versions.items()), *extra)
+    return etag, datetime.fromtimestamp(modified, timezone.utc)
+
+
+def row_validators(session, row_modified, *tables, extra=()):
+    # для одной строки: её modified_date плюс версии связанных таблиц
+    etag, last_modified = table_validators(session, *tables, extra=(row_modified,) + tuple(extra))
+    if row_modified is not None:
+        last_modified = max(last_modified, row_modified.astimezone(timezone.utc))
+    return etag, last_modified
+
+
+def is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+    # if_none_match - werkzeug ETags, if_modified_since - datetime в UTC;
+    # клиент может прислать ETag сжатого варианта ответа
+    if if_none_match:
+        return any(if_none_match.contains_weak(tag)
+                   for tag in [etag] + [encoded_etag(etag, encoding) for encoding in ENCODINGS])
+    if if_modified_since:
+        return last_modified.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def conditional_response(etag, last_modified, build):
+    # 304 без построения тела, если клиент уже имеет актуальную версию
+    if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
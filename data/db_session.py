@@ -1,34 +1,175 @@
+import threading
+
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
 from sqlalchemy.orm import Session
 import sqlalchemy.ext.declarative as dec
+from flask import g, has_app_context
 
 
 SqlAlchemyBase = dec.declarative_base()
 
 __factory = None
+__engine = None
+__scoped = None
+__settings = None
+
+# открытые и закрытые сессии: разница между ними - утечки или запросы в работе
+__stats = {'opened': 0, 'closed': 0}
+__stats_lock = threading.Lock()
 
+# профили движка: PRAGMA для каждого нового соединения и параметры пула
+ENGINE_PROFILES = {
+    'default': {
+        'pragmas': {},
+        'pool': {},
+    },
+    # WAL: читатели не ждут писателя, писатели ждут друг друга до busy_timeout
+    'concurrent': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -64000,  # в KiB, то есть 64 MiB на соединение
+            'mmap_size': 256 * 1024 * 1024,
+            'busy_timeout': 5000,  # мс
+            'temp_store': 'MEMORY',
+        },
+        'pool': {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 30,
+        },
+    },
+    # массовая загрузка (python -m data.seed): без fsync, большой кеш страниц;
+    # при сбое питания файл может быть повреждён, только для одного писателя
+    'bulk': {
+        'pragmas': {
+            'synchronous': 'OFF',
+            'cache_size': -512000,  # 500 MiB
+            'temp_store': 'MEMORY',
+        },
+        'pool': {},
+    },
+}
 
-def global_init(db_file):
-    global __factory
+
+def global_init(db_file, profile='default'):
+    global __factory, __engine, __scoped, __settings
 
     if __factory:
+        # подключение одно на процесс; другой файл молча не подменяется
+        if db_file and __settings[0] != db_file.strip():
+            raise Exception(f"База данных уже подключена: {__settings[0]}.")
         return
 
     if not db_file or not db_file.strip():
         raise Exception("Необходимо указать файл базы данных.")
+    if profile not in ENGINE_PROFILES:
+        raise Exception(f"Неизвестный профиль базы данных: {profile}.")
 
     conn_str = f'sqlite:///{db_file.strip()}?check_same_thread=False'
-    print(f"Подключение к базе данных по адресу {conn_str}")
+    print(f"Подключение к базе данных по адресу {conn_str} (профиль {profile})")
 
-    engine = sa.create_engine(conn_str, echo=False)
+    engine = sa.create_engine(conn_str, echo=False, **ENGINE_PROFILES[profile]['pool'])
+    set_pragmas(engine, ENGINE_PROFILES[profile]['pragmas'])
+    __engine = engine
+    __settings = (db_file.strip(), profile)
     __factory = orm.sessionmaker(bind=engine)
+    __scoped = orm.scoped_session(_open_session, scopefunc=_current_scope)
 
     from . import __all_models
 
     SqlAlchemyBase.metadata.create_all(engine)
 
+    from .migrations import migrate
 
-def create_session() -> Session:
-    global __factory
+    migrate(engine)
+
+    # create_all не добавляет новые индексы в уже существующие таблицы
+    for table in SqlAlchemyBase.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def set_pragmas(engine, pragmas):
+    if not pragmas:
+        return
+
+    @sa.event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def create_async_engine():
+    # движок aiosqlite для asgi.py с тем же файлом и профилем; схему и
+    # миграции уже применил global_init
+    from sqlalchemy.ext.asyncio import create_async_engine as create
+
+    db_file, profile = __settings
+    engine = create(f'sqlite+aiosqlite:///{db_file}', echo=False, **ENGINE_PROFILES[profile]['pool'])
+    set_pragmas(engine.sync_engine, ENGINE_PROFILES[profile]['pragmas'])
+    return engine
+
+
+def after_fork():
+    # в дочернем процессе (gunicorn с preload_app) соединения пула,
+    # открытые до fork, остаются родителю, потомок открывает свои
+    if __engine is not None:
+        __engine.dispose(close=False)
+
+
+def get_engine():
+    global __engine
+    return __engine
+
+
+def _open_session():
+    with __stats_lock:
+        __stats['opened'] += 1
     return __factory()
+
+
+def _current_scope():
+    # одна сессия на контекст приложения Flask (то есть на запрос),
+    # вне Flask - на поток
+    if has_app_context():
+        return id(g._get_current_object())
+    return threading.get_ident()
+
+
+def create_session() -> Session:
+    global __scoped
+    return __scoped()
+
+
+def remove_session(exception=None):
+    global __scoped
+    if __scoped is None or not __scoped.registry.has():
+        return
+    session = __scoped()
+    try:
+        if exception is None:
+            session.commit()
+        else:
+            session.rollback()
+    finally:
+        __scoped.remove()
+        with __stats_lock:
+            __stats['closed'] += 1
+
+
+def init_app(app):
+    @app.teardown_appcontext
+    def shutdown_session(exception=None):
+        remove_session(exception)
+
+
+def session_stats():
+    with __stats_lock:
+        stats = dict(__stats)
+    stats['active'] = stats['opened'] - stats['closed']
+    stats['pool_checked_out'] = __engine.pool.checkedout() if __engine is not None else 0
+    return stats
@@ -1,8 +1,11 @@
+import datetime
+
 import sqlalchemy
 from sqlalchemy import orm
-from sqlalchemy_serializer import SerializerMixin
 
+from .associations import department_members, listen_id_list
 from .db_session import SqlAlchemyBase
+from .serializers import SerializerMixin
 
 
 class Department(SqlAlchemyBase, SerializerMixin):
@@ -15,7 +18,17 @@ class Department(SqlAlchemyBase, SerializerMixin):
     members = sqlalchemy.Column(sqlalchemy.String, nullable=True)  # члены
     email = sqlalchemy.Column(sqlalchemy.String,
                               index=True, unique=True, nullable=True)  # электронная почта
+    modified_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now,
+                                      onupdate=datetime.datetime.now, index=True)  # дата изменения
     user = orm.relationship('User')
 
     def __repr__(self):
         return f"""id:{self.id}, title:{self.title}, email:{self.email}"""
+
+
+listen_id_list(Department, 'members', department_members, 'department_id')
+
+
+def member_department_ids(user_id):
+    return sqlalchemy.select(department_members.c.department_id) \
+        .where(department_members.c.user_id == user_id)
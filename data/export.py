@@ -0,0 +1,24 @@
+from flask import Response, stream_with_context
+
+from .serializers import dumps
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+EXPORT_BATCH_SIZE = 1000
+
+
+def wants_ndjson(request):
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def ndjson_response(query, serialize):
+    # строки читаются пачками через серверный курсор и отдаются клиенту сразу,
+    # поэтому память не растёт вместе с размером таблицы; сессию закрываем
+    # сами, так как генератор дочитывает её уже после teardown запроса
+    def generate():
+        try:
+            for item in query.yield_per(EXPORT_BATCH_SIZE):
+                yield dumps(serialize(item)) + b'\n'
+        finally:
+            query.session.close()
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,241 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import url_for
+from markupsafe import Markup, escape
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow необязателен, без него страницы ссылаются на оригиналы
+    Image = None
+
+WIDTHS = (320, 640, 1280)
+QUALITY = 80
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+# копия, которой пользовались позже, не удаляется: страницу со ссылкой на неё
+# мог только что отдать другой процесс. Время использования - mtime файла,
+# общее для всех процессов
+EVICT_GRACE = 10 * 60  # секунд
+
+logger = logging.getLogger(__name__)
+
+# расширение исходного файла -> формат Pillow для уменьшенных копий
+FALLBACK_FORMATS = {'jpg': 'jpeg', 'jpeg': 'jpeg', 'png': 'png', 'gif': 'png', 'webp': 'webp'}
+EXTENSIONS = {'jpeg': 'jpg', 'png': 'png', 'webp': 'webp'}
+
+_config = {
+    'static_folder': None,
+    'cache_folder': 'derived',  # внутри static_folder
+    'max_size': DEFAULT_MAX_SIZE,
+    'workers': 2,
+}
+
+# filename -> (mtime, size, ширина оригинала, [(формат, ширина, имя копии), ...])
+_sources = {}
+# копии на диске, известные этому процессу: имя -> размер
+_index = OrderedDict()
+_index_size = 0
+_pending = set()
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def configure(static_folder, cache_folder=None, max_size=None, workers=None):
+    global _index_size
+    _config['static_folder'] = static_folder
+    for key, value in (('cache_folder', cache_folder), ('max_size', max_size), ('workers', workers)):
+        if value is not None:
+            _config[key] = value
+    folder = _cache_path()
+    os.makedirs(folder, exist_ok=True)
+    # после перезапуска порядок восстанавливается по времени изменения файлов
+    entries = sorted(os.scandir(folder), key=lambda entry: entry.stat().st_mtime)
+    with _lock:
+        _sources.clear()
+        _index.clear()
+        for entry in entries:
+            if entry.is_file() and not entry.name.endswith('.part'):
+                _index[entry.name] = entry.stat().st_size
+        _index_size = sum(_index.values())
+        _evict()
+
+
+def _cache_path(name=''):
+    return os.path.join(_config['static_folder'], _config['cache_folder'], name)
+
+
+def _formats(extension):
+    formats = []
+    if Image is not None and features.check('webp'):
+        formats.append('webp')
+    fallback = FALLBACK_FORMATS.get(extension)
+    if fallback and fallback not in formats:
+        formats.append(fallback)
+    return formats
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _lock:
+        # потоки пула не переживают fork, в рабочем процессе создаём свой
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=_config['workers'], thread_name_prefix='images')
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _derive(filename, stat):
+    # выполняется в пуле: Pillow отпускает GIL на декодировании,
+    # масштабировании и сжатии, запросы не ждут
+    try:
+        path = os.path.join(_config['static_folder'], filename)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(64 * 1024), b''):
+                digest.update(chunk)
+        key = digest.hexdigest()[:24]
+        variants = []
+        with Image.open(path) as image:
+            image.load()
+            original_width = image.width
+            for fmt in _formats(filename.rsplit('.', 1)[-1].lower()):
+                for width in WIDTHS:
+                    if width >= original_width:
+                        break
+                    name = f'{key}-{width}-q{QUALITY}.{EXTENSIONS[fmt]}'
+                    if os.path.exists(_cache_path(name)):
+                        # копия от другого процесса или прошлого запуска
+                        os.utime(_cache_path(name))
+                        _register(name)
+                    else:
+                        _save_variant(image, width, fmt, name)
+                    variants.append((fmt, width, name))
+        with _lock:
+            _sources[filename] = (stat.st_mtime, stat.st_size, original_width, variants)
+    except Exception:
+        logger.exception('Не удалось подготовить копии %s', filename)
+    finally:
+        with _lock:
+            _pending.discard(filename)
+
+
+def _save_variant(image, width, fmt, name):
+    height = max(round(image.height * width / image.width), 1)
+    resized = image.resize((width, height), Image.LANCZOS)
+    if fmt == 'jpeg' and resized.mode not in ('RGB', 'L'):
+        resized = resized.convert('RGB')
+    part = _cache_path(name + '.part')
+    resized.save(part, format=fmt, quality=QUALITY, optimize=True)
+    os.replace(part, _cache_path(name))
+    _register(name)
+
+
+def _register(name):
+    global _index_size
+    size = os.path.getsize(_cache_path(name))
+    with _lock:
+        previous = _index_size
+        _index_size += size - _index.get(name, 0)
+        _index[name] = size
+        _index.move_to_end(name)
+        _evict()
+        if _index_size > _config['max_size'] and previous <= _config['max_size']:
+            logger.warning('Копии картинок заняли %d байт: все они использовались за последние %d с',
+                           _index_size, EVICT_GRACE)
+
+
+def _evict():
+    # вызывается под _lock: удаляем давно не использованные копии, пока кеш
+    # больше лимита. Порядок _index свой у каждого процесса, поэтому перед
+    # удалением смотрим mtime: недавно использованную другим процессом копию
+    # переносим в конец очереди
+    global _index_size
+    checked = 0
+    deadline = time.time() - EVICT_GRACE
+    while _index_size > _config['max_size'] and checked < len(_index):
+        old, size = next(iter(_index.items()))
+        try:
+            if os.stat(_cache_path(old)).st_mtime > deadline:
+                _index.move_to_end(old)
+                checked += 1
+                continue
+            os.remove(_cache_path(old))
+        except FileNotFoundError:
+            pass
+        del _index[old]
+        _index_size -= size
+
+
+def _use(name):
+    # False, если копии нет на диске; иначе отмечает использование: в очереди
+    # процесса и в mtime файла, но не чаще раза в половину EVICT_GRACE
+    try:
+        mtime = os.stat(_cache_path(name)).st_mtime
+    except FileNotFoundError:
+        return False
+    if mtime < time.time() - EVICT_GRACE / 2:
+        try:
+            os.utime(_cache_path(name))
+        except FileNotFoundError:
+            return False
+    with _lock:
+        if name in _index:
+            _index.move_to_end(name)
+    return True
+
+
+def variants(filename):
+    # (ширина оригинала, [(формат, ширина, имя), ...]) или None, пока копий нет;
+    # недостающие копии заказываются в пуле, вызов не ждёт их готовности
+    if Image is None or _config['static_folder'] is None:
+        return None
+    try:
+        stat = os.stat(os.path.join(_config['static_folder'], filename))
+    except FileNotFoundError:
+        return None
+    with _lock:
+        known = _sources.get(filename)
+    # готовность проверяется по диску: копию мог удалить другой процесс
+    if (known is not None and known[:2] == (stat.st_mtime, stat.st_size)
+            and all(_use(name) for fmt, width, name in known[3])):
+        return known[2], known[3]
+    with _lock:
+        if filename in _pending:
+            return None
+        _pending.add(filename)
+    _get_pool().submit(_derive, filename, stat)
+    return None
+
+
+def _static_url(filename):
+    return url_for('static', filename=filename)
+
+
+def picture(filename, sizes='100vw', **attrs):
+    # <picture> с WebP и уменьшенными копиями; до их готовности - обычный <img>
+    attributes = ''.join(f' {escape(key.rstrip("_"))}="{escape(value)}"'
+                         for key, value in attrs.items())
+    img = f'<img src="{escape(_static_url(filename))}"{attributes}>'
+    found = variants(filename)
+    if not found:
+        return Markup(img)
+    original_width, items = found
+    by_format = {}
+    for fmt, width, name in items:
+        by_format.setdefault(fmt, []).append(
+            f'{_static_url(_config["cache_folder"] + "/" + name)} {width}w')
+    fallback = FALLBACK_FORMATS.get(filename.rsplit('.', 1)[-1].lower())
+    sources = ''
+    for fmt, srcset in by_format.items():
+        if fmt != fallback:
+            sources += f'<source type="image/{fmt}" srcset="{escape(", ".join(srcset))}" sizes="{escape(sizes)}">'
+    srcset = by_format.get(fallback, []) + [f'{_static_url(filename)} {original_width}w']
+    img = (f'<img src="{escape(_static_url(filename))}" srcset="{escape(", ".join(srcset))}" '
+           f'sizes="{escape(sizes)}"{attributes}>')
+    return Markup(f'<picture>{sources}{img}</picture>')
@@ -2,9 +2,10 @@ import datetime
 
 import sqlalchemy
 from sqlalchemy import orm
-from sqlalchemy_serializer import SerializerMixin
 
+from data.associations import job_collaborators, listen_id_list
 from data.db_session import SqlAlchemyBase
+from data.serializers import SerializerMixin
 
 
 class Jobs(SqlAlchemyBase, SerializerMixin):
@@ -13,19 +14,29 @@ class Jobs(SqlAlchemyBase, SerializerMixin):
     id = sqlalchemy.Column(sqlalchemy.Integer,
                            primary_key=True, autoincrement=True)
     team_leader = sqlalchemy.Column(sqlalchemy.Integer,
-                                    sqlalchemy.ForeignKey('users.id'))  # id руководителя,
+                                    sqlalchemy.ForeignKey('users.id'), index=True)  # id руководителя,
 
     job = sqlalchemy.Column(sqlalchemy.String)  # description описание работы
     work_size = sqlalchemy.Column(sqlalchemy.Integer, nullable=True)  # hours объем работы в часах
     collaborators = sqlalchemy.Column(sqlalchemy.String)  # список id участников
     start_date = sqlalchemy.Column(sqlalchemy.DateTime,
-                                   default=datetime.datetime.now())  # дата начала
+                                   default=datetime.datetime.now, index=True)  # дата начала
 
-    end_date = sqlalchemy.Column(sqlalchemy.DateTime)  # дата окончания
+    end_date = sqlalchemy.Column(sqlalchemy.DateTime, index=True)  # дата окончания
 
-    is_finished = sqlalchemy.Column(sqlalchemy.Boolean, default=False)  # признак завершения
+    is_finished = sqlalchemy.Column(sqlalchemy.Boolean, default=False, index=True)  # признак завершения
+    modified_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now,
+                                      onupdate=datetime.datetime.now, index=True)  # дата изменения
 
     user = orm.relationship('User')
 
     def __repr__(self):
         return f"""id:{self.id}, job:{self.job}, start_date:{self.start_date}"""
+
+
+listen_id_list(Jobs, 'collaborators', job_collaborators, 'job_id')
+
+
+def collaborator_job_ids(user_id):
+    # подзапрос id работ, в которых участвует пользователь (по индексу user_id, job_id)
+    return sqlalchemy.select(job_collaborators.c.job_id).where(job_collaborators.c.user_id == user_id)
@@ -1,8 +1,14 @@
+from datetime import datetime
+
 import flask
-from flask import jsonify, request
+from flask import jsonify, request, url_for
+from sqlalchemy import delete, func, insert, orm, select, update
 
 from . import db_session
-from .jobs import Jobs
+from .associations import delete_ids, job_collaborators, sync_ids
+from .conditional import conditional_response, row_validators, table_validators
+from .export import ndjson_response, wants_ndjson
+from .jobs import Jobs, collaborator_job_ids
 
 blueprint = flask.Blueprint(
     'news_api',
@@ -11,103 +17,339 @@ blueprint = flask.Blueprint(
 )
 
 
+JOB_RULES = ('-user.jobs', '-user.departments', '-team_leader.jobs', '-team_leader.departments')
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+# фильтры списка работ: параметр запроса -> условие WHERE по его значению
+JOB_FILTERS = {
+    'is_finished': lambda value: Jobs.is_finished == (value.lower() in ('1', 'true', 'yes')),
+    'team_leader': lambda value: Jobs.team_leader == int(value),
+    'collaborator': lambda value: Jobs.id.in_(collaborator_job_ids(int(value))),
+    'start_from': lambda value: Jobs.start_date >= datetime.fromisoformat(value),
+    'start_to': lambda value: Jobs.start_date <= datetime.fromisoformat(value),
+    'end_from': lambda value: Jobs.end_date >= datetime.fromisoformat(value),
+    'end_to': lambda value: Jobs.end_date <= datetime.fromisoformat(value),
+}
+
+
+def filter_jobs(query, args):
+    for name, condition in JOB_FILTERS.items():
+        if name in args:
+            query = query.filter(condition(args[name]))
+    return query
+
+
+# Функции *_record и list_jobs работают с переданной сессией и возвращают
+# словарь ответа; их вызывают и представления Flask ниже, и асинхронный
+# сервер asgi.py (через AsyncSession.run_sync)
+
+def int_arg(args, name, default):
+    try:
+        return int(args[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def list_jobs(db_sess, args):
+    # ValueError - некорректное значение фильтра
+    limit = min(max(int_arg(args, 'limit', DEFAULT_PAGE_LIMIT), 1), MAX_PAGE_LIMIT)
+    after = int_arg(args, 'after', 0)
+    query = filter_jobs(db_sess.query(Jobs).options(orm.joinedload(Jobs.user)), args)
+    # keyset-пагинация: следующая страница начинается после последнего id
+    jobs = query.filter(Jobs.id > after).order_by(Jobs.id).limit(limit + 1).all()
+    next_args = None
+    if len(jobs) > limit:
+        jobs = jobs[:limit]
+        next_args = dict(args, after=jobs[-1].id, limit=limit)
+    return {'jobs': [item.to_dict(rules=JOB_RULES) for item in jobs], 'next': next_args}
+
+
+def job_modified(db_sess, job_id):
+    return db_sess.scalar(select(Jobs.modified_date).where(Jobs.id == job_id))
+
+
+def get_job_record(db_sess, job_id):
+    job = db_sess.get(Jobs, job_id, options=[orm.joinedload(Jobs.user)])
+    if not job:
+        return {'error': 'Not found'}
+    return {'job': job.to_dict(rules=JOB_RULES)}
+
+
+def create_job_record(db_sess, data):
+    if not data:
+        return {'error': 'Empty request'}
+    elif not all(key in data for key in
+                 ['team_leader', 'job', 'work_size']):
+        return {'error': 'Bad request'}
+
+    job = Jobs(
+        team_leader=data['team_leader'],
+        job=data['job'],
+        work_size=data['work_size']
+    )
+
+    if 'id' in data:
+        if db_sess.get(Jobs, data['id']):
+            return {'error': ' id already exists'}
+        job.id = data['id']
+    if 'collaborators' in data:
+        job.collaborators = data['collaborators']
+    if 'start_date' in data:
+        job.start_date = data['start_date']
+    if 'end_date' in data:
+        job.end_date = data['end_date']
+    if 'is_finished' in data:
+        job.is_finished = data['is_finished']
+    db_sess.add(job)
+    db_sess.commit()
+    return {'success': 'OK'}
+
+
+def edit_job_record(db_sess, job_id, data):
+    if not data:
+        return {'error': 'Empty request'}
+
+    job = db_sess.get(Jobs, job_id)
+    if not job:
+        return {'error': 'Not found'}
+
+    for key in ('team_leader', 'job', 'work_size', 'collaborators',
+                'start_date', 'end_date', 'is_finished'):
+        if key in data:
+            setattr(job, key, data[key])
+
+    db_sess.commit()
+    return {'success': 'OK'}
+
+
+def delete_job_record(db_sess, job_id):
+    job = db_sess.get(Jobs, job_id)
+    if not job:
+        return {'error': 'Not found'}
+    db_sess.delete(job)
+    db_sess.commit()
+    return {'success': 'OK'}
+
+
 @blueprint.route('/api/jobs', methods=['GET'])
 def get_jobs():
+    if wants_ndjson(request):
+        return export_jobs()
     db_sess = db_session.create_session()
-    jobs = db_sess.query(Jobs).all()
-    return jsonify(
-        {
-            'jobs':
-                [item.to_dict(rules=(
-                    '-user.jobs', '-user.departments', '-team_leader.jobs',
-                    '-team_leader.departments'))
-                    for item in jobs]
-        }
-    )
+    etag, last_modified = table_validators(db_sess, 'jobs', 'users', extra=(request.query_string,))
+    return conditional_response(etag, last_modified, lambda: jobs_page(db_sess))
+
+
+def jobs_page(db_sess):
+    try:
+        page = list_jobs(db_sess, request.args.to_dict())
+    except ValueError:
+        return jsonify({'error': 'Bad request'})
+    if page['next'] is not None:
+        page['next'] = url_for('news_api.get_jobs', **page['next'])
+    return jsonify(page)
+
+
+@blueprint.route('/api/jobs/export', methods=['GET'])
+def export_jobs():
+    db_sess = db_session.create_session()
+    try:
+        query = filter_jobs(db_sess.query(Jobs).options(orm.joinedload(Jobs.user)), request.args)
+    except ValueError:
+        return jsonify({'error': 'Bad request'})
+    return ndjson_response(query.order_by(Jobs.id),
+                           lambda item: item.to_dict(rules=JOB_RULES))
 
 
 @blueprint.route('/api/jobs/<int:job_id>', methods=['GET'])
 def get_one_job(job_id):
     db_sess = db_session.create_session()
-    job = db_sess.query(Jobs).get(job_id)
-    if not job:
-        return jsonify({'error': 'Not found'})
-    return jsonify(
-        {
-            'job': job.to_dict(rules=(
-                '-user.jobs', '-user.departments', '-team_leader.jobs', '-team_leader.departments'))
-        }
-    )
+    etag, last_modified = row_validators(db_sess, job_modified(db_sess, job_id), 'jobs', 'users',
+                                         extra=(job_id,))
+    return conditional_response(etag, last_modified,
+                                lambda: jsonify(get_job_record(db_sess, job_id)))
 
 
 @blueprint.route('/api/jobs', methods=['POST'])
 def create_job():
-    if not request.json:
+    return jsonify(create_job_record(db_session.create_session(), request.json))
+
+
+@blueprint.route('/api/jobs/<int:job_id>', methods=['PUT'])
+def edit_job(job_id):
+    return jsonify(edit_job_record(db_session.create_session(), job_id, request.json))
+
+
+@blueprint.route('/api/jobs/<int:job_id>', methods=['DELETE'])
+def delete_news(job_id):
+    return jsonify(delete_job_record(db_session.create_session(), job_id))
+
+
+MAX_BATCH_SIZE = 50000
+# SQLite ограничивает число параметров в одном запросе
+IN_CHUNK_SIZE = 500
+
+# поля работы: имя -> проверка значения из JSON
+JOB_FIELDS = {
+    'team_leader': lambda value: isinstance(value, int),
+    'job': lambda value: isinstance(value, str),
+    'work_size': lambda value: isinstance(value, int),
+    'collaborators': lambda value: value is None or isinstance(value, str),
+    'start_date': lambda value: value is None or isinstance(value, str),
+    'end_date': lambda value: value is None or isinstance(value, str),
+    'is_finished': lambda value: isinstance(value, bool),
+}
+
+
+def parse_job_fields(item):
+    # проверяет один элемент пакета, возвращает (поля для записи, ошибка)
+    if not isinstance(item, dict):
+        return None, 'Bad request'
+    fields = {}
+    for key, value in item.items():
+        if key == 'id':
+            continue
+        if key not in JOB_FIELDS or not JOB_FIELDS[key](value):
+            return None, f'Bad field {key}'
+        if key in ('start_date', 'end_date') and value is not None:
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return None, f'Bad field {key}'
+        fields[key] = value
+    if 'id' in item and not isinstance(item['id'], int):
+        return None, 'Bad field id'
+    return fields, None
+
+
+def existing_job_ids(db_sess, ids):
+    found = set()
+    ids = list(ids)
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        chunk = ids[start:start + IN_CHUNK_SIZE]
+        found.update(db_sess.scalars(select(Jobs.id).where(Jobs.id.in_(chunk))))
+    return found
+
+
+def batch_items(key):
+    items = request.json.get(key) if isinstance(request.json, dict) else request.json
+    if not isinstance(items, list) or not items or len(items) > MAX_BATCH_SIZE:
+        return None
+    return items
+
+
+def batch_response(results):
+    if any('error' in result for result in results):
+        return jsonify({'error': 'Bad request', 'results': results})
+    return jsonify({'success': 'OK', 'results': results})
+
+
+@blueprint.route('/api/jobs/batch', methods=['POST'])
+def create_jobs_batch():
+    items = batch_items('jobs') if request.json else None
+    if items is None:
         return jsonify({'error': 'Empty request'})
-    elif not all(key in request.json for key in
-                 ['team_leader', 'job', 'work_size']):
-        return jsonify({'error': 'Bad request'})
     db_sess = db_session.create_session()
 
-    job = Jobs(
-        team_leader=request.json['team_leader'],
-        job=request.json['job'],
-        work_size=request.json['work_size']
-    )
+    results, rows = [], []
+    for index, item in enumerate(items):
+        fields, error = parse_job_fields(item)
+        if error is None and not all(key in fields for key in ['team_leader', 'job', 'work_size']):
+            error = 'Bad request'
+        results.append({'index': index, 'error': error} if error else {'index': index})
+        if error is None:
+            row = {'id': item.get('id'), 'collaborators': None, 'start_date': datetime.now(),
+                   'end_date': None, 'is_finished': False}
+            row.update(fields)
+            rows.append((index, row))
 
-    if 'id' in request.json:
-        if db_sess.query(Jobs).get(request.json['id']):
-            return jsonify({'error': ' id already exists'})
-        job.id = request.json['id']
-    if 'collaborators' in request.json:
-        job.collaborators = request.json['collaborators']
-    if 'start_date' in request.json:
-        job.start_date = request.json['start_date']
-    if 'end_date' in request.json:
-        job.end_date = request.json['end_date']
-    if 'is_finished' in request.json:
-        job.is_finished = request.json['is_finished']
-    db_sess.add(job)
+    explicit = [row['id'] for _, row in rows if row['id'] is not None]
+    taken = existing_job_ids(db_sess, explicit)
+    seen = set()
+    for index, row in rows:
+        if row['id'] in taken or row['id'] in seen:
+            results[index]['error'] = 'id already exists'
+        if row['id'] is not None:
+            seen.add(row['id'])
+    if any('error' in result for result in results):
+        return batch_response(results)
+
+    # один executemany на строки с заданным id и один на остальные; SQLite
+    # выдаёт новым строкам id подряд после максимального, а таблица заблокирована
+    # на запись до конца транзакции, так что id вычисляются по max(id)
+    explicit_rows = [row for _, row in rows if row['id'] is not None]
+    auto_rows = [{k: v for k, v in row.items() if k != 'id'} for _, row in rows if row['id'] is None]
+    if explicit_rows:
+        db_sess.execute(insert(Jobs), explicit_rows)
+    if auto_rows:
+        db_sess.execute(insert(Jobs), auto_rows)
+        next_id = db_sess.scalar(select(func.max(Jobs.id))) - len(auto_rows) + 1
+        for index, row in rows:
+            if row['id'] is None:
+                row['id'] = next_id
+                next_id += 1
+    for index, row in rows:
+        results[index]['id'] = row['id']
+    sync_ids(db_sess.connection(), job_collaborators, 'job_id',
+             [(row['id'], row['collaborators']) for _, row in rows])
     db_sess.commit()
-    return jsonify({'success': 'OK'})
+    return batch_response(results)
 
 
-@blueprint.route('/api/jobs/<int:job_id>', methods=['PUT'])
-def edit_job(job_id):
-    if not request.json:
+@blueprint.route('/api/jobs/batch', methods=['PATCH'])
+def edit_jobs_batch():
+    items = batch_items('jobs') if request.json else None
+    if items is None:
         return jsonify({'error': 'Empty request'})
     db_sess = db_session.create_session()
 
-    if not db_sess.query(Jobs).get(job_id):
-        return jsonify({'error': 'Not found'})
-
-    job = db_sess.query(Jobs).get(job_id)
-
-    if 'team_leader' in request.json:
-        job.team_leader = request.json['team_leader']
-    if 'job' in request.json:
-        job.job = request.json['job']
-    if 'work_size' in request.json:
-        job.work_size = request.json['work_size']
-    if 'collaborators' in request.json:
-        job.collaborators = request.json['collaborators']
-    if 'start_date' in request.json:
-        job.start_date = request.json['start_date']
-    if 'end_date' in request.json:
-        job.end_date = request.json['end_date']
-    if 'is_finished' in request.json:
-        job.is_finished = request.json['is_finished']
+    results, rows = [], []
+    for index, item in enumerate(items):
+        fields, error = parse_job_fields(item)
+        if error is None and 'id' not in item:
+            error = 'Bad request'
+        results.append({'index': index, 'id': item.get('id'), 'error': error} if error
+                       else {'index': index, 'id': item['id']})
+        if error is None:
+            rows.append((index, dict(fields, id=item['id'])))
+
+    found = existing_job_ids(db_sess, [row['id'] for _, row in rows])
+    for index, row in rows:
+        if row['id'] not in found:
+            results[index]['error'] = 'Not found'
+    if any('error' in result for result in results):
+        return batch_response(results)
 
+    # ORM bulk UPDATE по первичному ключу: executemany по группам одинаковых полей
+    db_sess.execute(update(Jobs), [row for _, row in rows])
+    sync_ids(db_sess.connection(), job_collaborators, 'job_id',
+             [(row['id'], row['collaborators']) for _, row in rows if 'collaborators' in row])
     db_sess.commit()
-    return jsonify({'success': 'OK'})
+    return batch_response(results)
 
 
-@blueprint.route('/api/jobs/<int:job_id>', methods=['DELETE'])
-def delete_news(job_id):
+@blueprint.route('/api/jobs/batch', methods=['DELETE'])
+def delete_jobs_batch():
+    ids = batch_items('ids') if request.json else None
+    if ids is None:
+        return jsonify({'error': 'Empty request'})
+    if not all(isinstance(job_id, int) for job_id in ids):
+        return jsonify({'error': 'Bad request'})
     db_sess = db_session.create_session()
-    job = db_sess.query(Jobs).get(job_id)
-    if not job:
-        return jsonify({'error': 'Not found'})
-    db_sess.delete(job)
+
+    found = existing_job_ids(db_sess, set(ids))
+    results = [{'index': index, 'id': job_id} if job_id in found
+               else {'index': index, 'id': job_id, 'error': 'Not found'}
+               for index, job_id in enumerate(ids)]
+    if any('error' in result for result in results):
+        return batch_response(results)
+
+    found = list(found)
+    for start in range(0, len(found), IN_CHUNK_SIZE):
+        chunk = found[start:start + IN_CHUNK_SIZE]
+        db_sess.execute(delete(Jobs).where(Jobs.id.in_(chunk)))
+        delete_ids(db_sess.connection(), job_collaborators, 'job_id', chunk)
     db_sess.commit()
-    return jsonify({'success': 'OK'})
\ No newline at end of file
+    return batch_response(results)
@@ -0,0 +1,233 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import Response, before_render_template, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import db_session
+
+# метрики в текстовом формате Prometheus: GET /metrics. Счётчики свои у
+# каждого процесса, под gunicorn каждый рабочий процесс отдаёт только свои
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_lock = threading.Lock()
+# замеры текущего запроса; ContextVar, а не g, чтобы работать и в asgi.py
+_current = ContextVar('request_metrics', default=None)
+_template_started = ContextVar('template_started', default=None)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, values, amount=1):
+        # вызывается под _lock
+        self.series[values] = self.series.get(values, 0) + amount
+
+    def samples(self):
+        for values, total in self.series.items():
+            yield f'{self.name}{format_labels(self.labels, values)} {total:g}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, values, value):
+        # вызывается под _lock; в корзине хранится только её число, суммы
+        # по le считаются при выводе
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for values, series in self.series.items():
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                total += count
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{format_labels(self.labels, values, le)} {total}'
+            yield f'{self.name}_sum{format_labels(self.labels, values)} {series[-1]:g}'
+            yield f'{self.name}_count{format_labels(self.labels, values)} {total}'
+
+
+requests_total = Counter('mars_http_requests_total', 'Обработанные запросы.',
+                         ('method', 'endpoint', 'status'))
+request_duration = Histogram('mars_http_request_duration_seconds', 'Время обработки запроса.',
+                             ('method', 'endpoint'))
+request_queries = Histogram('mars_http_request_sql_queries', 'SQL-запросов на один запрос.',
+                            ('endpoint',), QUERY_BUCKETS)
+sql_queries = Counter('mars_sql_queries_total', 'SQL-запросы, выполненные при обработке запросов.',
+                      ('endpoint',))
+sql_seconds = Counter('mars_sql_seconds_total', 'Время SQL-запросов при обработке запросов.',
+                      ('endpoint',))
+template_duration = Histogram('mars_template_render_seconds', 'Время отрисовки шаблона.',
+                              ('template',))
+METRICS = (requests_total, request_duration, request_queries, sql_queries, sql_seconds,
+           template_duration)
+
+
+class RequestStats:
+    __slots__ = ('started', 'method', 'endpoint', 'status', 'queries', 'sql_time', 'template_time')
+
+    def __init__(self, method, endpoint):
+        self.started = time.perf_counter()
+        self.method = method
+        self.endpoint = endpoint
+        self.status = 500  # если ответ так и не был сформирован
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+    def server_timing(self):
+        total = (time.perf_counter() - self.started) * 1000
+        return (f'app;dur={total:.1f}, db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries", '
+                f'tpl;dur={self.template_time * 1000:.1f}')
+
+
+def start_request(method, endpoint):
+    stats = RequestStats(method, endpoint)
+    _current.set(stats)
+    return stats
+
+
+def current_endpoint():
+    stats = _current.get()
+    return stats.endpoint if stats is not None else None
+
+
+def current_queries():
+    # SQL-запросов в текущем запросе к этому моменту
+    stats = _current.get()
+    return stats.queries if stats is not None else 0
+
+
+def cancel_request():
+    # запрос ушёл другому обработчику, который считает его сам
+    _current.set(None)
+
+
+def finish_request():
+    stats = _current.get()
+    if stats is None:
+        return
+    _current.set(None)
+    duration = time.perf_counter() - stats.started
+    with _lock:
+        requests_total.inc((stats.method, stats.endpoint, stats.status))
+        request_duration.observe((stats.method, stats.endpoint), duration)
+        request_queries.observe((stats.endpoint,), stats.queries)
+        if stats.queries:
+            sql_queries.inc((stats.endpoint,), stats.queries)
+            sql_seconds.inc((stats.endpoint,), stats.sql_time)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def finish_query(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, '_metrics_started', None)
+    if stats is not None and started is not None:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def start_template(sender, template, context, **extra):
+    _template_started.set(time.perf_counter())
+
+
+def finish_template(sender, template, context, **extra):
+    started = _template_started.get()
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.template_time += duration
+    with _lock:
+        template_duration.observe((template.name,), duration)
+
+
+def render():
+    lines = []
+    with _lock:
+        for metric in METRICS:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+    # сессии и пул - мгновенные значения, читаются при запросе метрик
+    stats = db_session.session_stats()
+    for name, key, kind, description in (
+            ('mars_db_sessions_opened_total', 'opened', 'counter', 'Открытые сессии базы.'),
+            ('mars_db_sessions_closed_total', 'closed', 'counter', 'Закрытые сессии базы.'),
+            ('mars_db_sessions_active', 'active', 'gauge', 'Незакрытые сессии базы.'),
+            ('mars_db_pool_checked_out', 'pool_checked_out', 'gauge', 'Соединения, выданные пулом.')):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.append(f'{name} {stats[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    # Server-Timing раскрывает время запросов к базе, поэтому выключен по умолчанию
+    app.config.setdefault('SERVER_TIMING', False)
+    before_render_template.connect(start_template, app)
+    template_rendered.connect(finish_template, app)
+
+    @app.before_request
+    def start_timer():
+        start_request(request.method, request.endpoint or 'none')
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = _current.get()
+        if stats is not None:
+            stats.status = response.status_code
+            if app.config['SERVER_TIMING']:
+                response.headers['Server-Timing'] = stats.server_timing()
+        return response
+
+    # teardown_appcontext вызывается в обратном порядке регистрации: init_app
+    # до db_session.init_app, чтобы время включало commit сессии. Тело
+    # потокового ответа (NDJSON) отдаётся уже после teardown и не учитывается
+    @app.teardown_appcontext
+    def record_request(exception=None):
+        finish_request()
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
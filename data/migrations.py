@@ -0,0 +1,62 @@
+import datetime
+
+import sqlalchemy
+
+from .associations import department_members, job_collaborators, sync_ids
+from .search import SEARCH_TABLES, create_search_index
+from .versions import VERSIONED_TABLES, create_version_triggers
+
+# номер последней применённой миграции хранится в PRAGMA user_version
+MIGRATIONS = []
+
+
+def migration(version):
+    def decorator(func):
+        MIGRATIONS.append((version, func))
+        return func
+    return decorator
+
+
+@migration(1)
+def fill_id_lists(connection):
+    # перенос строк "2, 3" из jobs и departments в таблицы связей
+    jobs = connection.execute(sqlalchemy.text('SELECT id, collaborators FROM jobs')).all()
+    sync_ids(connection, job_collaborators, 'job_id', jobs)
+    departments = connection.execute(sqlalchemy.text('SELECT id, members FROM departments')).all()
+    sync_ids(connection, department_members, 'department_id', departments)
+
+
+def add_column(connection, table, name, ddl):
+    columns = [row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info({table})')]
+    if name not in columns:
+        connection.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}')
+
+
+@migration(2)
+def add_modified_dates(connection):
+    # дата изменения строк и триггеры версий таблиц для условных GET
+    now = sqlalchemy.bindparam('now', datetime.datetime.now(), type_=sqlalchemy.DateTime)
+    for table in ('jobs', 'departments'):
+        add_column(connection, table, 'modified_date', 'DATETIME')
+        connection.execute(sqlalchemy.text(
+            f'UPDATE {table} SET modified_date = :now WHERE modified_date IS NULL').bindparams(now))
+    for table in VERSIONED_TABLES:
+        create_version_triggers(connection, table)
+
+
+@migration(3)
+def add_search_index(connection):
+    # полнотекстовые индексы FTS5 для /search и /api/search
+    for table in SEARCH_TABLES:
+        create_search_index(connection, table)
+
+
+def migrate(engine):
+    with engine.begin() as connection:
+        current = connection.exec_driver_sql('PRAGMA user_version').scalar()
+        for version, func in sorted(MIGRATIONS):
+            if version <= current:
+                continue
+            print(f"Применение миграции {version}: {func.__name__}")
+            func(connection)
+            connection.exec_driver_sql(f'PRAGMA user_version = {version}')
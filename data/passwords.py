@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# хэширование паролей - тяжёлая по CPU работа, поэтому выполняется в пуле
+# процессов, а не в потоке, обслуживающем запрос
+_config = {
+    'method': 'scrypt:32768:8:1',  # или, например, 'pbkdf2:sha256:600000'
+    'workers': os.cpu_count() or 1,  # 0 - считать в текущем потоке
+    'max_pending': 64,  # сколько хэширований может ждать пул одновременно
+    'timeout': 30,
+    'prefix': None,  # начало хэша до '$' для method, см. method_prefix
+}
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(_config['max_pending'])
+
+
+class HashingBusy(ServiceUnavailable):
+    description = 'Слишком много одновременных входов, повторите попытку позже.'
+
+
+def configure(method=None, workers=None, max_pending=None, timeout=None):
+    global _pool, _slots
+    for key, value in (('method', method), ('workers', workers),
+                       ('max_pending', max_pending), ('timeout', timeout)):
+        if value is not None:
+            _config[key] = value
+    if method is not None:
+        _config['prefix'] = method_prefix(method)
+    _slots = threading.BoundedSemaphore(_config['max_pending'])
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def _exit_with_parent(parent_pid):
+    # процесс пула не должен пережить родителя, убитого сигналом без atexit
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        # после fork пул родителя непригоден, создаём свой
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=_config['workers'],
+                                        mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_exit_with_parent, initargs=(os.getpid(),))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _run(func, *args):
+    if not _config['workers']:
+        return func(*args)
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise HashingBusy(retry_after=1)
+    try:
+        return _get_pool().submit(func, *args).result(timeout=_config['timeout'])
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, _config['method'])
+
+
+def verify_password(hashed_password, password):
+    return _run(check_password_hash, hashed_password, password)
+
+
+def method_prefix(method):
+    # werkzeug дописывает параметры по умолчанию ('scrypt' -> 'scrypt:32768:8:1'),
+    # поэтому префикс берётся из настоящего хэша, а не из строки метода
+    return generate_password_hash('', method).split('$', 1)[0] + '$'
+
+
+def needs_rehash(hashed_password):
+    # хэш сделан другим методом или с другой стоимостью, чем настроено сейчас
+    if _config['prefix'] is None:
+        _config['prefix'] = method_prefix(_config['method'])
+    return not hashed_password.startswith(_config['prefix'])
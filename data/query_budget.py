@@ -0,0 +1,26 @@
+import logging
+
+from flask import request
+
+from . import metrics
+
+DEFAULT_QUERY_BUDGET = 20
+
+logger = logging.getLogger(__name__)
+
+
+def init_app(app):
+    # запросы считает metrics для каждого запроса, здесь только проверка бюджета
+    app.config.setdefault('QUERY_BUDGET', DEFAULT_QUERY_BUDGET)
+
+    @app.after_request
+    def check_query_budget(response):
+        # заголовок и предупреждение только в режиме отладки
+        if not app.debug:
+            return response
+        count = metrics.current_queries()
+        response.headers['X-Query-Count'] = str(count)
+        if count > app.config['QUERY_BUDGET']:
+            logger.warning('%s %s: %d SQL-запросов при бюджете %d',
+                           request.method, request.path, count, app.config['QUERY_BUDGET'])
+        return response
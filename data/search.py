@@ -0,0 +1,103 @@
+import re
+
+import sqlalchemy
+from sqlalchemy import orm
+
+from .departments import Department
+from .jobs import Jobs
+from .users import User
+
+# полнотекстовый поиск на FTS5: у каждой таблицы индекс <таблица>_search с
+# внешним содержимым (текст хранится только в самой таблице), индекс
+# поддерживается триггерами, поэтому видит и запись мимо ORM
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# сортировка по bm25 проходит по всем совпадениям, а для частых слов их
+# миллионы, поэтому ранжируются только RANK_WINDOW самых новых совпадений.
+# Если совпадений не больше окна, порядок точный; иначе результат помечается
+# как усечённый
+RANK_WINDOW = 1000
+TOKENIZER = 'unicode61 remove_diacritics 2'
+
+# таблица: (модель, индексируемые столбцы, веса столбцов для bm25, опции загрузки)
+SEARCH_TABLES = {
+    'jobs': (Jobs, ('job',), (1.0,), (orm.joinedload(Jobs.user),)),
+    'users': (User, ('surname', 'name', 'speciality', 'position'), (3.0, 3.0, 1.0, 1.0),
+              (orm.selectinload(User.departments),)),
+    'departments': (Department, ('title',), (1.0,), (orm.joinedload(Department.user),)),
+}
+
+
+def create_search_index(connection, table):
+    columns = ', '.join(SEARCH_TABLES[table][1])
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_search USING fts5({columns}, "
+        f"content='{table}', content_rowid='id', tokenize='{TOKENIZER}')")
+    create_search_triggers(connection, table)
+    rebuild_search_index(connection, table)
+
+
+def create_search_triggers(connection, table):
+    columns = SEARCH_TABLES[table][1]
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    # из индекса с внешним содержимым строка удаляется командой 'delete'
+    # со старыми значениями столбцов
+    delete = f"INSERT INTO {table}_search({table}_search, rowid, {names}) VALUES ('delete', old.id, {old});"
+    insert = f'INSERT INTO {table}_search(rowid, {names}) VALUES (new.id, {new});'
+    for event, body in (('INSERT', insert), ('DELETE', delete),
+                        (f'UPDATE OF {names}', delete + ' ' + insert)):
+        connection.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS {table}_search_{event.split()[0].lower()} '
+            f'AFTER {event} ON {table} BEGIN {body} END')
+
+
+def drop_search_triggers(connection, table):
+    # для массовой загрузки: индекс потом строится целиком rebuild_search_index
+    for event in ('insert', 'delete', 'update'):
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {table}_search_{event}')
+
+
+def rebuild_search_index(connection, table):
+    connection.exec_driver_sql(f"INSERT INTO {table}_search({table}_search) VALUES ('rebuild')")
+
+
+def match_query(text):
+    # свободный текст -> запрос FTS5: все слова обязательны; слово со звёздочкой
+    # на конце ищется как префикс. Префиксный запрос собирает в памяти все
+    # совпадения, поэтому только по явной просьбе. Кавычки исключают синтаксис
+    # FTS5 из ввода
+    words = re.findall(r'(\w+)(\*?)', text or '')[:10]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"{star}' for word, star in words)
+
+
+def search(session, table, text, page=1, limit=DEFAULT_LIMIT):
+    # -> (модели в порядке релевантности, есть ли следующая страница,
+    #     ранжированы ли только RANK_WINDOW самых новых совпадений)
+    model, columns, weights, options = SEARCH_TABLES[table]
+    query = match_query(text)
+    offset = (page - 1) * limit
+    if query is None:
+        return [], False, False
+    index = f'{table}_search'
+    # один проход: FTS5 отдаёт совпадения по убыванию rowid без сортировки,
+    # bm25 считается только для окна, а сортируется окно уже здесь. Лишняя
+    # строка сверх окна показывает, что совпадений больше
+    rows = session.execute(sqlalchemy.text(
+        f'SELECT rowid, bm25({index}, {", ".join(map(str, weights))}) FROM {index} '
+        f'WHERE {index} MATCH :query ORDER BY rowid DESC LIMIT :window'
+    ), {'query': query, 'window': RANK_WINDOW + 1}).all()
+    truncated = len(rows) > RANK_WINDOW
+    del rows[RANK_WINDOW:]
+    if offset >= len(rows):
+        return [], False, truncated
+    # bm25 тем меньше, чем строка релевантнее; сортировка устойчива, поэтому
+    # при равной оценке новые строки остаются выше
+    rows.sort(key=lambda row: row[1])
+    ids = [row[0] for row in rows[offset:offset + limit]]
+    has_next = len(rows) > offset + limit
+    found = {item.id: item for item in session.query(model).options(*options).filter(model.id.in_(ids))}
+    return [found[item_id] for item_id in ids if item_id in found], has_next, truncated
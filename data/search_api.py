@@ -0,0 +1,37 @@
+import flask
+from flask import jsonify, request, url_for
+
+from . import db_session
+from .jobs_api import JOB_RULES
+from .search import DEFAULT_LIMIT, MAX_LIMIT, RANK_WINDOW, SEARCH_TABLES, search
+
+blueprint = flask.Blueprint(
+    'search_api',
+    __name__,
+    template_folder='templates'
+)
+
+# правила сериализации найденных строк по типу
+SEARCH_RULES = {
+    'jobs': JOB_RULES + ('-user.hashed_password',),
+    'users': ('-jobs', '-departments.user', '-hashed_password'),
+    'departments': ('-user.jobs', '-user.departments', '-user.hashed_password'),
+}
+
+
+@blueprint.route('/api/search', methods=['GET'])
+def search_records():
+    table = request.args.get('type', 'jobs')
+    page = request.args.get('page', 1, type=int)
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    if table not in SEARCH_TABLES or page < 1 or limit < 1:
+        return jsonify({'error': 'Bad request'})
+    limit = min(limit, MAX_LIMIT)
+    query = request.args.get('q', '')
+    found, has_next, truncated = search(db_session.create_session(), table, query, page, limit)
+    next_url = None
+    if has_next:
+        next_url = url_for('search_api.search_records', q=query, type=table, page=page + 1, limit=limit)
+    # truncated: совпадений больше RANK_WINDOW, ранжированы только самые новые
+    return jsonify({table: [item.to_dict(rules=SEARCH_RULES[table]) for item in found],
+                    'next': next_url, 'truncated': truncated, 'rank_window': RANK_WINDOW})
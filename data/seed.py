@@ -0,0 +1,254 @@
+# Синтетические данные для стендов и замеров: пользователи, работы с
+# участниками и датами, отделы - в любом количестве, до десятков миллионов строк.
+#   python -m data.seed db/staging.db --users 1000000 --jobs 20000000 --workers 4
+# Строки генерируются пачками (с --workers - в пуле процессов), а пишутся одним
+# соединением, потому что у SQLite один писатель: executemany готовых кортежей, крупные
+# транзакции, индексы пустой таблицы строятся после загрузки. Одинаковые
+# --seed и --chunk-size дают одинаковую базу при любом числе процессов.
+import argparse
+import collections
+import datetime
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import sqlalchemy
+
+from . import db_session, passwords
+from .associations import department_members, job_collaborators
+from .departments import Department
+from .jobs import Jobs
+from .users import User
+from .search import create_search_triggers, drop_search_triggers, rebuild_search_index
+from .versions import create_version_triggers, drop_version_triggers, touch_version
+
+PASSWORD = 'password'
+CHUNK_SIZE = 20000
+COMMIT_EVERY = 500000  # строк в одной транзакции
+START_DATE = datetime.datetime(2023, 1, 1)
+PERIOD_MINUTES = 3 * 365 * 24 * 60  # работы начинаются в течение трёх лет
+
+NAMES = ('Ridley', 'Harry', 'Joe', 'Mark', 'Anna', 'Maria', 'Ivan', 'Olga', 'Chen', 'Amir',
+         'Sofia', 'Lucas', 'Emma', 'Noah', 'Mia', 'Leo', 'Zoe', 'Yuri', 'Nina', 'Omar')
+SURNAMES = ('Scott', 'Potter', 'Biden', 'Twen', 'Watney', 'Lewis', 'Martinez', 'Johanssen',
+            'Beck', 'Vogel', 'Ivanov', 'Petrova', 'Kim', 'Singh', 'Garcia', 'Novak', 'Smith')
+POSITIONS = ('captain', 'colonist', 'engineer', 'navigator', 'medic', 'scientist', 'technician')
+SPECIALITIES = ('research engineer', 'pilot', 'builder', 'doctor', 'climatologist', 'exobiologist',
+                'geologist', 'botanist', 'chemist', 'programmer')
+JOB_ACTIONS = ('deployment', 'cleaning', 'repair', 'inspection', 'assembly', 'calibration', 'survey')
+JOB_OBJECTS = ('residential module', 'greenhouse', 'solar array', 'water recycler', 'rover',
+               'drill rig', 'oxygen plant', 'landing pad', 'airlock', 'antenna')
+DEPARTMENT_TITLES = ('Geological exploration', 'Life support', 'Engineering', 'Medicine',
+                     'Research', 'Navigation', 'Agriculture', 'Logistics', 'Communications')
+
+
+def user_email(user_id):
+    return f'user{user_id}@mars.org'
+
+
+def random_ids(rand, users, count, exclude=None):
+    # count разных id пользователей из 1..users, кроме exclude
+    count = min(count, users - (exclude is not None))
+    ids = set()
+    while len(ids) < count:
+        user_id = int(rand() * users) + 1
+        if user_id != exclude:
+            ids.add(user_id)
+    return sorted(ids)
+
+
+def sql_datetime(value):
+    # формат, в котором DateTime SQLAlchemy хранит даты в SQLite
+    return value.isoformat(' ', 'microseconds') if value is not None else None
+
+
+# строки - кортежи в порядке COLUMNS, даты уже строками: привязка параметров
+# через SQLAlchemy стоила бы больше, чем сама вставка
+def user_rows(rng, first_id, count, context):
+    rand, choice = rng.random, rng.choice
+    rows = [
+        (i, choice(SURNAMES), choice(NAMES), 18 + int(rand() * 53), choice(POSITIONS),
+         choice(SPECIALITIES), f'module_{int(rand() * 50) + 1}', user_email(i),
+         context['hashed_password'], context['now'])
+        for i in range(first_id, first_id + count)]
+    return rows, []
+
+
+def job_rows(rng, first_id, count, context):
+    rand, choice, users = rng.random, rng.choice, context['users']
+    rows, links = [], []
+    for i in range(first_id, first_id + count):
+        leader = int(rand() * users) + 1
+        collaborators = random_ids(rand, users, int(rand() * 6), exclude=leader)
+        work_size = int(rand() * 100) + 1
+        start_date = START_DATE + datetime.timedelta(minutes=int(rand() * PERIOD_MINUTES))
+        is_finished = rand() < 0.6
+        # у незавершённых работ дата окончания плановая или не задана
+        end_date = None
+        if is_finished or rand() < 0.5:
+            end_date = start_date + datetime.timedelta(hours=work_size * (1 + 2 * rand()))
+        rows.append((i, leader, f'{choice(JOB_ACTIONS)} of {choice(JOB_OBJECTS)} {int(rand() * 20) + 1}',
+                     work_size, ', '.join(map(str, collaborators)), sql_datetime(start_date),
+                     sql_datetime(end_date), int(is_finished), context['now']))
+        links.extend((i, user_id) for user_id in collaborators)
+    return rows, links
+
+
+def department_rows(rng, first_id, count, context):
+    rand, choice, users = rng.random, rng.choice, context['users']
+    rows, links = [], []
+    for i in range(first_id, first_id + count):
+        members = random_ids(rand, users, 3 + int(rand() * 18))
+        rows.append((i, f'{choice(DEPARTMENT_TITLES)} {i}', int(rand() * users) + 1,
+                     ', '.join(map(str, members)), f'department{i}@mars.org', context['now']))
+        links.extend((i, user_id) for user_id in members)
+    return rows, links
+
+
+# таблица: (генератор пачки, таблица строк, таблица связей)
+TABLES = {
+    'users': (user_rows, User.__table__, None),
+    'jobs': (job_rows, Jobs.__table__, job_collaborators),
+    'departments': (department_rows, Department.__table__, department_members),
+}
+COLUMNS = {
+    'users': ('id', 'surname', 'name', 'age', 'position', 'speciality', 'address', 'email',
+              'hashed_password', 'modified_date'),
+    'jobs': ('id', 'team_leader', 'job', 'work_size', 'collaborators', 'start_date', 'end_date',
+             'is_finished', 'modified_date'),
+    'departments': ('id', 'title', 'chief', 'members', 'email', 'modified_date'),
+    'job_collaborators': ('job_id', 'user_id'),
+    'department_members': ('department_id', 'user_id'),
+}
+
+
+def insert_sql(table):
+    columns = COLUMNS[table.name]
+    return f'INSERT INTO {table.name} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+
+
+def generate_chunk(name, first_id, count, seed, context):
+    # своё зерно у каждой пачки: результат не зависит от порядка и процесса
+    rng = random.Random(f'{seed}:{name}:{first_id}')
+    return TABLES[name][0](rng, first_id, count, context)
+
+
+def generate(name, first_id, count, seed, context, chunk_size, executor, window):
+    # пачки по порядку id; в пуле не больше window пачек впереди записи
+    tasks = ((name, start, min(chunk_size, first_id + count - start), seed, context)
+             for start in range(first_id, first_id + count, chunk_size))
+    if executor is None:
+        for task in tasks:
+            yield generate_chunk(*task)
+        return
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(executor.submit(generate_chunk, *task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def max_id(connection, table):
+    return connection.execute(sqlalchemy.select(sqlalchemy.func.max(table.c.id))).scalar() or 0
+
+
+def load(connection, name, count, seed, context, chunk_size, executor, window, log):
+    table, links = TABLES[name][1:]
+    first_id = max_id(connection, table) + 1
+    # пустую таблицу быстрее заполнить без индексов (в том числе поискового)
+    # и построить их один раз
+    indexes = []
+    if first_id == 1:
+        indexes = [index for item in (table, links) if item is not None for index in item.indexes]
+    for index in indexes:
+        index.drop(connection)
+    if indexes:
+        drop_search_triggers(connection, name)
+    drop_version_triggers(connection, name)
+    connection.commit()
+
+    started = time.perf_counter()
+    written = uncommitted = 0
+    try:
+        for rows, link_rows in generate(name, first_id, count, seed, context, chunk_size, executor, window):
+            connection.exec_driver_sql(insert_sql(table), rows)
+            if link_rows:
+                connection.exec_driver_sql(insert_sql(links), link_rows)
+            written += len(rows)
+            uncommitted += len(rows)
+            if uncommitted >= COMMIT_EVERY:
+                connection.commit()
+                uncommitted = 0
+                log(f'{name}: {written}/{count}')
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        create_version_triggers(connection, name)
+        touch_version(connection, name)
+        for index in indexes:
+            index.create(connection)
+        if indexes:
+            create_search_triggers(connection, name)
+            rebuild_search_index(connection, name)
+        connection.commit()
+    elapsed = time.perf_counter() - started
+    log(f'{name}: {written} строк за {elapsed:.1f} с ({written / max(elapsed, 1e-9):.0f} строк/с)')
+
+
+def populate(engine, users=0, jobs=0, departments=0, seed=1, workers=0, chunk_size=CHUNK_SIZE,
+             password=PASSWORD, log=print):
+    executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+    try:
+        with engine.connect() as connection:
+            context = {
+                'users': max_id(connection, User.__table__) + users,
+                # один хэш на всех: scrypt на миллион строк занял бы часы
+                'hashed_password': passwords.hash_password(password) if users else None,
+                'now': sql_datetime(datetime.datetime.now()),
+            }
+            if (jobs or departments) and not context['users']:
+                raise ValueError('Для работ и отделов нужны пользователи.')
+            for name, count in (('users', users), ('jobs', jobs), ('departments', departments)):
+                if count:
+                    load(connection, name, count, seed, context, chunk_size, executor, 2 * workers, log)
+            # статистика для планировщика; analysis_limit ограничивает время
+            connection.exec_driver_sql('PRAGMA analysis_limit = 1000')
+            connection.exec_driver_sql('ANALYZE')
+            connection.commit()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Заполнение базы синтетическими данными.')
+    parser.add_argument('db', nargs='?', default=os.environ.get('MARS_DB', 'db/blogs.db'))
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--jobs', type=int, default=20000)
+    parser.add_argument('--departments', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=0, help='процессы генерации, 0 - в текущем')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--password', default=PASSWORD, help='пароль всех пользователей')
+    args = parser.parse_args()
+    if min(args.users, args.jobs, args.departments, args.workers) < 0 or args.chunk_size < 1:
+        parser.error('количества не могут быть отрицательными')
+
+    db_session.global_init(args.db, 'bulk')
+    passwords.configure(workers=0)
+    started = time.perf_counter()
+    try:
+        populate(db_session.get_engine(), args.users, args.jobs, args.departments, args.seed,
+                 args.workers, args.chunk_size, args.password)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f'готово за {time.perf_counter() - started:.1f} с')
+
+
+if __name__ == '__main__':
+    main()
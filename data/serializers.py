@@ -0,0 +1,128 @@
+import json
+import threading
+
+import sqlalchemy as sa
+from sqlalchemy_serializer import SerializerMixin as BaseSerializerMixin
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него работает стандартный json
+    orjson = None
+
+
+def dumps(data):
+    # JSON в байтах, по возможности через orjson
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _parse_rules(rules):
+    # ('-user.jobs', '-user.departments') -> {'user': {'jobs': None, 'departments': None}}
+    # None означает, что ключ исключён полностью
+    tree = {}
+    for rule in rules:
+        if not rule.startswith('-'):
+            raise NotCompilable(rule)
+        *path, last = rule[1:].split('.')
+        node = tree
+        for key in path:
+            node = node.setdefault(key, {})
+            if node is None:
+                break
+        else:
+            node[last] = None
+    return tree
+
+
+def _column_converter(model, column):
+    python_type = None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        pass
+    if python_type is None or python_type in (int, str, float, bool):
+        return None
+    if python_type.__name__ in ('datetime', 'date', 'time'):
+        fmt = getattr(model, python_type.__name__ + '_format')
+        return lambda value: value.strftime(fmt)
+    raise NotCompilable(column.key)
+
+
+def _compile(model, excluded, path):
+    if model in path:
+        # SerializerMixin уходит в бесконечную рекурсию на таких правилах
+        raise NotCompilable(model.__name__)
+    for option in ('serialize_only', 'serialize_rules', 'serialize_types', 'serializable_keys',
+                   'serialize_columns', 'exclude_values', 'auto_serialize_properties'):
+        if getattr(model, option, None):
+            # нестандартные настройки модели обрабатывает только SerializerMixin
+            raise NotCompilable(model.__name__)
+    mapper = sa.inspect(model)
+    columns = []
+    for attr in mapper.column_attrs:
+        if attr.key in excluded and excluded[attr.key] is None:
+            continue
+        columns.append((attr.key, _column_converter(model, attr.columns[0])))
+    relations = []
+    for rel in mapper.relationships:
+        sub = excluded.get(rel.key, {})
+        if sub is None:
+            continue
+        child = _compile(rel.mapper.class_, sub, path + (model,))
+        relations.append((rel.key, rel.uselist, child))
+    unknown = set(excluded) - set(mapper.attrs.keys())
+    if unknown:
+        raise NotCompilable(', '.join(sorted(unknown)))
+
+    def serialize(obj):
+        state = obj.__dict__
+        result = {}
+        for key, convert in columns:
+            # просроченные после commit атрибуты загружаются обычным путём
+            value = state[key] if key in state else getattr(obj, key)
+            if value is not None and convert is not None:
+                value = convert(value)
+            result[key] = value
+        for key, uselist, child in relations:
+            value = getattr(obj, key)
+            if uselist:
+                result[key] = [child(item) for item in value]
+            else:
+                result[key] = child(value) if value is not None else None
+        return result
+
+    return serialize
+
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def compile_serializer(model, rules=()):
+    # план колонок и связей строится один раз на пару (модель, правила),
+    # дальше объекты сериализуются без разбора правил и рефлексии;
+    # None - правила не поддерживаются, нужен обычный SerializerMixin
+    key = (model, tuple(rules))
+    if key in _compiled:
+        return _compiled[key]
+    with _lock:
+        if key not in _compiled:
+            try:
+                _compiled[key] = _compile(model, _parse_rules(rules), ())
+            except NotCompilable:
+                _compiled[key] = None
+        return _compiled[key]
+
+
+class SerializerMixin(BaseSerializerMixin):
+    def to_dict(self, only=(), rules=(), **kwargs):
+        if not only and not any(value is not None for value in kwargs.values()):
+            serializer = compile_serializer(type(self), rules)
+            if serializer is not None:
+                return serializer(self)
+        return super().to_dict(only=only, rules=rules, **kwargs)
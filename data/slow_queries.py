@@ -0,0 +1,150 @@
+import datetime
+import json
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import abort, jsonify, request
+from flask_login import current_user, login_required
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import metrics
+
+# запросы дольше порога пишутся в журнал одной JSON-строкой вместе с
+# параметрами, endpoint и планом EXPLAIN QUERY PLAN
+DEFAULT_THRESHOLD = 0.1  # секунд
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+MAX_PARAMETER_LENGTH = 100  # длинные строки и байты заменяются на их длину
+# хэши werkzeug: 'scrypt:32768:8:1$соль$хэш', 'pbkdf2:sha256:...$соль$хэш'
+PASSWORD_HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+TAIL_BYTES = 256 * 1024  # сколько читать с конца журнала для просмотра
+EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+
+_config = {
+    'threshold': None,  # None - журнал выключен (не задан путь)
+    'path': None,
+}
+
+
+def configure(path, threshold=DEFAULT_THRESHOLD, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS):
+    # у каждого процесса свой обработчик; при ротации несколькими рабочими
+    # процессами gunicorn часть строк может попасть в уже переименованный файл
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    _config['threshold'] = threshold if path else None
+    _config['path'] = path
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    if _config['threshold'] is not None:
+        context._slow_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def finish_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_slow_started', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    if duration < _config['threshold']:
+        return
+    if executemany:
+        # план одинаков для всех строк, показываем первую
+        parameters = parameters[0] if parameters else ()
+    plan = explain(conn, statement, parameters)
+    record = {
+        'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+        'duration_ms': round(duration * 1000, 2),
+        'endpoint': metrics.current_endpoint(),
+        'statement': statement,
+        'parameters': ({key: clip(value) for key, value in parameters.items()}
+                       if isinstance(parameters, dict) else [clip(value) for value in parameters]),
+        'plan': plan,
+        # SCAN без USING - полный просмотр таблицы; два таких в одном плане
+        # обычно означают декартово произведение
+        'full_scans': [line.strip() for line in plan if is_full_scan(line)],
+    }
+    logger.warning(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def clip(value):
+    # в журнал не попадает ни часть хэша пароля, ни начало длинного текста
+    if isinstance(value, bytes):
+        return f'<bytes len={len(value)}>'
+    if isinstance(value, str) and (len(value) > MAX_PARAMETER_LENGTH
+                                   or value.startswith(PASSWORD_HASH_PREFIXES)):
+        return f'<str len={len(value)}>'
+    return value
+
+
+def is_full_scan(line):
+    detail = line.strip()
+    return detail.startswith('SCAN ') and ' USING ' not in detail
+
+
+def explain(conn, statement, parameters):
+    if not statement.lstrip().upper().startswith(EXPLAINED):
+        return []
+    # курсор драйвера на том же соединении: события SQLAlchemy не срабатывают,
+    # а план видит незакоммиченные изменения текущей транзакции
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        rows = cursor.fetchall()
+    except Exception as error:
+        return [f'EXPLAIN не выполнен: {error}']
+    finally:
+        cursor.close()
+    # (id, parent, notused, detail) -> строки с отступом по вложенности
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+def recent(limit=100):
+    # последние записи текущего файла журнала, новые первыми
+    path = _config['path']
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(file.tell() - TAIL_BYTES, 0))
+        lines = file.read().splitlines()
+    records = []
+    for line in reversed(lines):
+        try:
+            records.append(json.loads(line))
+        except ValueError:  # первая строка могла быть прочитана не с начала
+            continue
+        if len(records) >= limit:
+            break
+    return records
+
+
+def init_app(app):
+    @app.route('/api/slow_queries')
+    @login_required
+    def slow_queries():
+        if current_user.id != 1:
+            abort(404)
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+        return jsonify({'threshold_ms': (_config['threshold'] or 0) * 1000,
+                        'queries': recent(limit)})
@@ -0,0 +1,46 @@
+import hashlib
+
+from flask import make_response, render_template, request
+
+from .compression import compress, encoded_etag, negotiate, supported_encodings
+
+
+class StaticPage:
+    # страница без данных из запроса и базы: шаблон отрисовывается один раз,
+    # тело хранится в памяти вместе со сжатыми копиями и ETag
+    def __init__(self, template, **context):
+        self.template = template
+        self.context = context
+        self.bodies = None
+        self.etag = None
+
+    def render(self):
+        body = render_template(self.template, **self.context).encode('utf-8')
+        bodies = {encoding: compress(body, encoding, best=True) for encoding in supported_encodings()}
+        bodies['identity'] = body
+        self.etag = hashlib.md5(body).hexdigest()
+        self.bodies = bodies
+
+    def response(self):
+        if self.bodies is None:
+            self.render()
+        encoding = negotiate(request.accept_encodings) or 'identity'
+        # у каждого варианта сжатия свой ETag, как требует HTTP для разных тел
+        etag = self.etag if encoding == 'identity' else encoded_etag(self.etag, encoding)
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(self.bodies[encoding])
+            response.mimetype = 'text/html'
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+def render_all(app, pages):
+    # при запуске: url_for внутри шаблонов требует контекста запроса
+    with app.test_request_context('/'):
+        for page in pages:
+            page.render()
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024
+
+# сигнатуры в начале файла -> расширение; остальное не принимаем
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+class UploadError(Exception):
+    pass
+
+
+def image_extension(head):
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def save_image(storage, folder, max_size=DEFAULT_MAX_SIZE):
+    # файл копируется кусками по CHUNK_SIZE во временный файл рядом с
+    # итоговым, по пути считается sha256; память не зависит от размера файла.
+    # Имя - хеш содержимого, поэтому повторная загрузка не создаёт копий
+    if storage is None or not storage.filename:
+        raise UploadError('Файл не выбран')
+    os.makedirs(folder, exist_ok=True)
+    fd, part_path = tempfile.mkstemp(dir=folder, suffix='.part')
+    try:
+        digest = hashlib.sha256()
+        head = b''
+        size = 0
+        with os.fdopen(fd, 'wb') as part:
+            while True:
+                chunk = storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadError(f'Файл больше {max_size // (1024 * 1024)} МБ')
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                digest.update(chunk)
+                part.write(chunk)
+        extension = image_extension(head)
+        if extension is None:
+            raise UploadError('Файл не является изображением')
+        name = f'{digest.hexdigest()}.{extension}'
+        if not os.path.exists(os.path.join(folder, name)):
+            # тот же файл уже загружен - оставляем его как есть (и его копии)
+            os.replace(part_path, os.path.join(folder, name))
+        return name
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
@@ -0,0 +1,44 @@
+from flask_login import UserMixin
+
+from .cache import LRUCache, SqliteCache
+
+PRINCIPAL_FIELDS = ('id', 'name', 'surname', 'email')
+
+_cache = LRUCache(maxsize=10000, ttl=300)
+
+
+class UserPrincipal(UserMixin):
+    # лёгкая замена User для current_user: только то, что нужно страницам
+    def __init__(self, id, name, surname, email):
+        self.id = id
+        self.name = name
+        self.surname = surname
+        self.email = email
+
+    def __repr__(self):
+        return f"""id:{self.id}, name:{self.name}, email:{self.email}"""
+
+
+def configure(backend=None, ttl=300, maxsize=10000):
+    # backend: None - кеш в памяти процесса, иначе путь к файлу SQLite,
+    # общему для всех рабочих процессов
+    global _cache
+    if backend:
+        _cache = SqliteCache(backend, ttl=ttl)
+    else:
+        _cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+
+def get_principal(user_id, load_user):
+    data = _cache.get(user_id)
+    if data is None:
+        user = load_user(user_id)
+        if user is None:
+            return None
+        data = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        _cache.set(user_id, data)
+    return UserPrincipal(**data)
+
+
+def invalidate(user_id):
+    _cache.delete(user_id)
@@ -0,0 +1,34 @@
+from sqlalchemy import select
+
+from . import db_session
+from .cache import LRUCache
+from .users import User
+from .versions import version_key
+
+# при большем числе пользователей поле выбора подгружает варианты по мере ввода
+TYPEAHEAD_THRESHOLD = 200
+
+_cache = LRUCache(maxsize=4)
+
+
+def user_names():
+    # {id: name} для полей выбора пользователя, перечитывается после
+    # создания или удаления пользователя (версия таблицы users)
+    session = db_session.create_session()
+    version = version_key(session, 'users')
+    names = _cache.get(version)
+    if names is None:
+        names = dict(session.execute(select(User.id, User.name).order_by(User.id)).all())
+        _cache.set(version, names)
+    return names
+
+
+def search_users(query, limit=20):
+    query = query.casefold()
+    result = []
+    for user_id, name in user_names().items():
+        if query in (name or '').casefold():
+            result.append((user_id, name))
+            if len(result) >= limit:
+                break
+    return result
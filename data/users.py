@@ -2,18 +2,24 @@ import datetime
 import sqlalchemy
 from flask_login import UserMixin
 from sqlalchemy import orm
-from sqlalchemy_serializer import SerializerMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 
+from . import passwords
 from .db_session import SqlAlchemyBase
+from .serializers import SerializerMixin
 
 
 class UserPassword():
     def set_password(self, password):
-        self.hashed_password = generate_password_hash(password)
+        self.hashed_password = passwords.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.hashed_password, password)
+        if not self.hashed_password or not passwords.verify_password(self.hashed_password, password):
+            return False
+        # при смене метода или стоимости хэш обновляется при следующем входе,
+        # сохранится вместе с сессией запроса
+        if passwords.needs_rehash(self.hashed_password):
+            self.set_password(password)
+        return True
 
     def __repr__(self):
         return f"""id:{self.id}, name:{self.name}, email:{self.email}"""
@@ -34,8 +40,8 @@ class User(SqlAlchemyBase, UserPassword, UserMixin, SerializerMixin):
                               index=True, unique=True, nullable=True)  # электронная почта
 
     hashed_password = sqlalchemy.Column(sqlalchemy.String, nullable=True)  # хэшированный пароль
-    modified_date = sqlalchemy.Column(sqlalchemy.DateTime,
-                                      default=datetime.datetime.now)  # дата изменения
+    modified_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now,
+                                      onupdate=datetime.datetime.now, index=True)  # дата изменения
     jobs = orm.relationship('Jobs', back_populates='user')
 
     departments = orm.relationship("Department", back_populates='user')
\ No newline at end of file
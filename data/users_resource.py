@@ -1,11 +1,17 @@
 from datetime import datetime
 
-from flask import jsonify
+from flask import jsonify, request
 from flask_restful import reqparse, abort, Api, Resource
+from sqlalchemy import orm, select
 
-from data import db_session
+from data import db_session, user_cache
+from data.conditional import conditional_response, row_validators, table_validators
+from data.export import ndjson_response, wants_ndjson
+from data.user_choices import search_users
 from data.users import User
 
+USER_LIST_RULES = ('-jobs', '-departments.user')
+
 parser = reqparse.RequestParser()
 parser.add_argument('surname', required=True)
 parser.add_argument('name', required=True)
@@ -18,29 +24,69 @@ parser.add_argument('password', required=True)
 parser.add_argument('modified_date', type=datetime)
 
 
+# функции *_record работают с переданной сессией, их же вызывает asgi.py;
+# None - пользователь не найден
+
+def user_modified(session, users_id):
+    return session.scalar(select(User.modified_date).where(User.id == users_id))
+
+
+def get_user_record(session, users_id):
+    user = session.get(User, users_id, options=[orm.selectinload(User.jobs),
+                                                orm.selectinload(User.departments)])
+    if not user:
+        return None
+    return {'user': user.to_dict(rules=('-jobs.user', '-departments.user'))}
+
+
+def list_user_records(session):
+    users = session.query(User).options(orm.selectinload(User.departments)).all()
+    return {'users': [item.to_dict(rules=USER_LIST_RULES) for item in users]}
+
+
+def delete_user_record(session, users_id):
+    user = session.get(User, users_id)
+    if not user:
+        return None
+    session.delete(user)
+    session.commit()
+    user_cache.invalidate(users_id)
+    return {'success': 'OK'}
+
+
+def not_found_message(users_id):
+    return f"User {users_id} not found"
+
+
 class UsersResource(Resource):
     def get(self, users_id):
-        abort_if_users_not_found(users_id)
         session = db_session.create_session()
-        user = session.query(User).get(users_id)
-        return jsonify({'user': user.to_dict(
-            rules=('-jobs.user', '-departments.user'))})
+        modified = user_modified(session, users_id)
+        etag, last_modified = row_validators(session, modified, 'users', 'jobs', 'departments',
+                                             extra=(users_id,))
+        return conditional_response(etag, last_modified, lambda: self.build(session, users_id))
+
+    def build(self, session, users_id):
+        record = get_user_record(session, users_id)
+        if record is None:
+            abort(404, message=not_found_message(users_id))
+        return jsonify(record)
 
     def delete(self, users_id):
-        abort_if_users_not_found(users_id)
-        session = db_session.create_session()
-        user = session.query(User).get(users_id)
-        session.delete(user)
-        session.commit()
-        return jsonify({'success': 'OK'})
+        record = delete_user_record(db_session.create_session(), users_id)
+        if record is None:
+            abort(404, message=not_found_message(users_id))
+        return jsonify(record)
 
 
 class UsersListResource(Resource):
     def get(self):
+        if wants_ndjson(request):
+            return UsersExportResource().get()
         session = db_session.create_session()
-        users = session.query(User).all()
-        return jsonify({'users': [item.to_dict(
-            rules=('-jobs', '-departments.user')) for item in users]})
+        etag, last_modified = table_validators(session, 'users', 'departments')
+        return conditional_response(etag, last_modified,
+                                    lambda: jsonify(list_user_records(session)))
 
     def post(self):
         args = parser.parse_args()
@@ -59,11 +105,20 @@ class UsersListResource(Resource):
         user.set_password(args['password'])
         session.add(user)
         session.commit()
+        user_cache.invalidate(user.id)
         return jsonify({'success': 'OK'})
 
 
-def abort_if_users_not_found(users_id):
-    session = db_session.create_session()
-    users = session.query(User).get(users_id)
-    if not users:
-        abort(404, message=f"User {users_id} not found")
\ No newline at end of file
+class UsersExportResource(Resource):
+    def get(self):
+        session = db_session.create_session()
+        query = session.query(User).options(orm.selectinload(User.departments))
+        return ndjson_response(query.order_by(User.id),
+                               lambda item: item.to_dict(rules=USER_LIST_RULES))
+
+
+class UsersChoicesResource(Resource):
+    def get(self):
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        choices = search_users(request.args.get('q', ''), limit)
+        return jsonify({'users': [{'id': user_id, 'name': name} for user_id, name in choices]})
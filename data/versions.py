@@ -0,0 +1,55 @@
+import sqlalchemy
+
+from .db_session import SqlAlchemyBase
+
+VERSIONED_TABLES = ('users', 'jobs', 'departments')
+
+# версия и время последнего изменения каждой таблицы; ведутся триггерами,
+# поэтому учитывают запись из любого процесса, в том числе массовую
+table_versions = sqlalchemy.Table(
+    'table_versions', SqlAlchemyBase.metadata,
+    sqlalchemy.Column('name', sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column('version', sqlalchemy.Integer, nullable=False, default=0),
+    sqlalchemy.Column('modified', sqlalchemy.Float, nullable=False),  # unix time
+)
+
+NOW_SQL = "(julianday('now') - 2440587.5) * 86400.0"
+TRIGGER_EVENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def touch_sql(table):
+    return f"UPDATE table_versions SET version = version + 1, modified = {NOW_SQL} WHERE name = '{table}'"
+
+
+def create_version_triggers(connection, table):
+    connection.execute(sqlalchemy.text(
+        f'INSERT OR IGNORE INTO table_versions (name, version, modified) VALUES (:name, 0, {NOW_SQL})'
+    ), {'name': table})
+    for event in TRIGGER_EVENTS:
+        connection.exec_driver_sql(
+            f'CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} '
+            f'BEGIN {touch_sql(table)}; END'
+        )
+
+
+def drop_version_triggers(connection, table):
+    # для массовой загрузки: триггер срабатывает на каждую строку
+    for event in TRIGGER_EVENTS:
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {table}_version_{event.lower()}')
+
+
+def touch_version(connection, table):
+    connection.exec_driver_sql(touch_sql(table))
+
+
+def read_versions(session, *tables):
+    # {таблица: (версия, время изменения)}
+    rows = session.execute(sqlalchemy.select(table_versions).where(table_versions.c.name.in_(tables)))
+    return {name: (version, modified) for name, version, modified in rows}
+
+
+def version_key(session, *tables):
+    # ключ кеша по версиям таблиц; версии хранятся в базе, поэтому ключ видит
+    # изменения из других процессов (рабочие процессы gunicorn)
+    versions = read_versions(session, *tables)
+    return tuple(versions.get(table, (0, 0))[0] for table in tables)
@@ -1,11 +1,13 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField, SelectField, EmailField
+from wtforms import StringField, SubmitField, EmailField
 from wtforms.validators import DataRequired
 
+from forms.fields import UserSelectField
+
 
 class DepartmentForm(FlaskForm):
     title = StringField('Название департамента', validators=[DataRequired()])
-    chief = SelectField('Шеф', coerce=int, validators=[DataRequired()])
+    chief = UserSelectField('Шеф', validators=[DataRequired()])
     members = StringField('Список id участников', validators=[DataRequired()])
     email = EmailField('Email', validators=[DataRequired()])
     submit = SubmitField('Добавить')
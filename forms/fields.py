@@ -0,0 +1,25 @@
+from flask import url_for
+from wtforms import SelectField, ValidationError
+
+from data.user_choices import TYPEAHEAD_THRESHOLD, user_names
+
+
+class UserSelectField(SelectField):
+    # выбор пользователя: варианты берутся из общего кеша (id, name),
+    # а при большом экипаже в HTML попадает только выбранный вариант,
+    # остальные подгружаются через /api/v2/users/choices
+    def __init__(self, label=None, validators=None, **kwargs):
+        super().__init__(label, validators, coerce=int, validate_choice=False, **kwargs)
+
+    def __call__(self, **kwargs):
+        names = user_names()
+        if len(names) > TYPEAHEAD_THRESHOLD:
+            self.choices = [(self.data, names[self.data])] if self.data in names else []
+            kwargs.setdefault('data-typeahead', url_for('userschoicesresource'))
+        else:
+            self.choices = list(names.items())
+        return super().__call__(**kwargs)
+
+    def pre_validate(self, form):
+        if self.data not in user_names():
+            raise ValidationError(self.gettext('Not a valid choice.'))
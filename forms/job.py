@@ -1,11 +1,12 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField, IntegerField, SelectField, BooleanField, \
-    DateTimeLocalField
+from wtforms import StringField, SubmitField, IntegerField, BooleanField, DateTimeLocalField
 from wtforms.validators import DataRequired, Optional
 
+from forms.fields import UserSelectField
+
 
 class JobForm(FlaskForm):
-    team_leader = SelectField('Руководитель', coerce=int, validators=[DataRequired()])
+    team_leader = UserSelectField('Руководитель', validators=[DataRequired()])
     job = StringField('Описание работы', validators=[DataRequired()])
     work_size = IntegerField('Объем работы в часах', validators=[DataRequired()])
     collaborators = StringField('Список id участников', validators=[DataRequired()])
@@ -0,0 +1,33 @@
+# Запуск: gunicorn -c gunicorn.conf.py wsgi:app
+# Перезагрузка без потери запросов:
+#   kill -HUP <master>   - новые рабочие процессы, старые дорабатывают запросы;
+#                          при MARS_PRELOAD=0 подхватывается и новый код
+#   kill -USR2 <master>, затем kill -QUIT <старый master>
+#                        - замена кода при preload_app (новый master)
+import multiprocessing
+import os
+
+bind = os.environ.get('MARS_BIND', '127.0.0.1:8080')
+workers = int(os.environ.get('MARS_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('MARS_THREADS', 4))
+worker_class = 'gthread'
+
+# приложение, движок и миграции готовятся один раз в master до fork
+preload_app = os.environ.get('MARS_PRELOAD', '1') == '1'
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# перезапуск рабочих процессов по очереди, чтобы не копилась память
+max_requests = int(os.environ.get('MARS_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# у каждого рабочего процесса свой пул хеширования паролей, делим ядра между ними
+os.environ.setdefault('MARS_PASSWORD_WORKERS', str(max(multiprocessing.cpu_count() // workers, 1)))
+
+
+def post_fork(server, worker):
+    from data import db_session
+
+    db_session.after_fork()
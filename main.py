@@ -1,51 +1,103 @@
-from flask import Flask, url_for, request, render_template, redirect, abort
+import os
+
+from flask import Blueprint, Flask, current_app, request, render_template, redirect, abort, jsonify
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_restful import Api
-
-from data import db_session, jobs_api, users_resource
-from data.departments import Department
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy import func, orm
+
+from data import (assets, compression, db_session, images, jobs_api, metrics, passwords, query_budget,
+                  search_api, slow_queries, uploads, user_cache, users_resource)
+from data.cache import LRUCache
+from data.departments import Department, member_department_ids
+from data.static_pages import StaticPage, render_all
 from data.jobs import Jobs
+from data.search import RANK_WINDOW, SEARCH_TABLES, search
 from data.users import User
+from data.versions import version_key
 from forms.department import DepartmentForm, EdDepartmentForm
 from forms.job import JobForm, EdJobForm
 from forms.login_form import LoginForm
 from forms.user import RegisterForm
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'yandexlyceum_secret_key'
+# страницы приложения; create_app подключает их к каждому новому приложению
+blueprint = Blueprint('main', __name__)
 
 login_manager = LoginManager()
-login_manager.init_app(app)
-
-api = Api(app)
-
-api.add_resource(users_resource.UsersListResource, '/api/v2/users')
 
-api.add_resource(users_resource.UsersResource, '/api/v2/users/<int:news_id>')
+# отрисованные страницы журнала работ, ключ включает версии таблиц jobs и users
+jobs_page_cache = LRUCache(maxsize=512)
 
+# страницы без динамики отрисовываются один раз при запуске
+promotion_page = StaticPage('promotion.html', lines=['Человечество вырастает из детства.',
+                                                     'Человечеству мала одна планета.',
+                                                     'Мы сделаем обитаемыми безжизненные пока планеты.',
+                                                     'И начнем с Марса!',
+                                                     'Присоединяйся!'])
+load_photo_page = StaticPage('load_photo.html')
+form_sample_page = StaticPage('form_sample.html')
 
 @login_manager.user_loader
 def load_user(user_id):
-    db_sess = db_session.create_session()
-    return db_sess.query(User).filter(User.id == user_id).first()
+    # сессия открывается только при промахе кеша
+    return user_cache.get_principal(
+        int(user_id), lambda user_id: db_session.create_session().get(User, user_id))
+
 
+@blueprint.route('/api/db_stats')
+def db_stats():
+    return jsonify(db_session.session_stats())
 
-@app.route('/')
-@app.route('/index')
+
+@blueprint.route('/')
+@blueprint.route('/index')
 def index():
+    page = max(request.args.get('page', 1, type=int), 1)
+    page_size = current_app.config['JOBS_PAGE_SIZE']
+    viewer = current_user.id if current_user.is_authenticated else None
+    key = (version_key(db_session.create_session(), 'jobs', 'users'), page, page_size, viewer)
+    jobs_page = jobs_page_cache.get(key)
+    if jobs_page is None:
+        jobs_page = render_jobs_page(page, page_size)
+        jobs_page_cache.set(key, jobs_page)
+    return render_template('index.html', jobs_page=jobs_page, title='Журнал работ')
+
+
+def render_jobs_page(page, page_size):
     session = db_session.create_session()
-    jobs = session.query(Jobs).all()
-    return render_template('index.html', jobs=jobs, title='Журнал работ')
+    total = session.query(func.count(Jobs.id)).scalar()
+    pages = max((total + page_size - 1) // page_size, 1)
+    offset = (page - 1) * page_size
+    jobs = session.query(Jobs).options(orm.joinedload(Jobs.user)) \
+        .order_by(Jobs.id).offset(offset).limit(page_size).all()
+    return render_template('jobs_page.html', jobs=jobs, page=page, pages=pages, offset=offset)
 
 
-@app.route('/departments')
+@blueprint.route('/departments')
 def departments():
     session = db_session.create_session()
-    departments = session.query(Department).all()
+    query = session.query(Department).options(orm.joinedload(Department.user))
+    member = request.args.get('member', type=int)
+    if member is not None:
+        query = query.filter(Department.id.in_(member_department_ids(member)))
+    departments = query.all()
     return render_template('departments.html', departments=departments, title='Журнал департаментов')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@blueprint.route('/search')
+def search_page():
+    query = request.args.get('q', '')
+    table = request.args.get('type', 'jobs')
+    if table not in SEARCH_TABLES:
+        table = 'jobs'
+    page = max(request.args.get('page', 1, type=int), 1)
+    found, has_next, truncated = search(db_session.create_session(), table, query, page)
+    return render_template('search.html', title='Поиск', query=query, table=table, found=found,
+                           page=page, has_next=has_next, truncated=truncated, rank_window=RANK_WINDOW)
+
+
+@blueprint.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -60,14 +112,14 @@ def login():
     return render_template('login.html', title='Авторизация', form=form)
 
 
-@app.route('/logout')
+@blueprint.route('/logout')
 @login_required
 def logout():
     logout_user()
     return redirect("/")
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@blueprint.route('/register', methods=['GET', 'POST'])
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
@@ -92,17 +144,16 @@ def register():
         user.set_password(form.password.data)
         db_sess.add(user)
         db_sess.commit()
+        user_cache.invalidate(user.id)
         return redirect('/login')
     return render_template('register.html', title='Регистрация', form=form)
 
 
-@app.route('/addjob', methods=['GET', 'POST'])
+@blueprint.route('/addjob', methods=['GET', 'POST'])
 @login_required
 def addjob():
     form = JobForm()
     db_sess = db_session.create_session()
-    users = db_sess.query(User).all()
-    form.team_leader.choices = [(i.id, i.name) for i in users]
     if form.validate_on_submit():
         job = Jobs(
             team_leader=form.team_leader.data,
@@ -122,17 +173,15 @@ def addjob():
     return render_template('job.html', title='Добавление работы', form=form)
 
 
-@app.route('/jobs/<int:id>', methods=['GET', 'POST'])
+@blueprint.route('/jobs/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_job(id):
     form = EdJobForm()
     db_sess = db_session.create_session()
-    users = db_sess.query(User).all()
-    form.team_leader.choices = [(i.id, i.name) for i in users]
     if request.method == "GET":
         job = db_sess.query(Jobs).filter(Jobs.id == id).first()
         if job:
-            if job.user == current_user or current_user.id == 1:
+            if job.team_leader == current_user.id or current_user.id == 1:
                 form.team_leader.data = job.team_leader
                 form.job.data = job.job
                 form.work_size.data = job.work_size
@@ -161,12 +210,12 @@ def edit_job(id):
     return render_template('job.html', title='Редактирование работы', form=form)
 
 
-@app.route('/jobs_delete/<int:id>', methods=['GET', 'POST'])
+@blueprint.route('/jobs_delete/<int:id>', methods=['GET', 'POST'])
 @login_required
 def jobs_delete(id):
     db_sess = db_session.create_session()
     job = db_sess.query(Jobs).filter(Jobs.id == id).first()
-    if job and (Jobs.user == current_user or current_user.id == 1):
+    if job and (job.team_leader == current_user.id or current_user.id == 1):
         db_sess.delete(job)
         db_sess.commit()
     else:
@@ -174,13 +223,11 @@ def jobs_delete(id):
     return redirect('/')
 
 
-@app.route('/adddepartment', methods=['GET', 'POST'])
+@blueprint.route('/adddepartment', methods=['GET', 'POST'])
 @login_required
 def adddepartment():
     form = DepartmentForm()
     db_sess = db_session.create_session()
-    users = db_sess.query(User).all()
-    form.chief.choices = [(i.id, i.name) for i in users]
     if form.validate_on_submit():
         department = Department(
             title=form.title.data,
@@ -194,17 +241,15 @@ def adddepartment():
     return render_template('department.html', title='Добавление департамента', form=form)
 
 
-@app.route('/departments/<int:id>', methods=['GET', 'POST'])
+@blueprint.route('/departments/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_department(id):
     form = EdDepartmentForm()
     db_sess = db_session.create_session()
-    users = db_sess.query(User).all()
-    form.chief.choices = [(i.id, i.name) for i in users]
     if request.method == "GET":
         department = db_sess.query(Department).filter(Department.id == id).first()
         if department:
-            if department.user == current_user or current_user.id == 1:
+            if department.chief == current_user.id or current_user.id == 1:
                 form.title.data = department.title
                 form.chief.data = department.chief
                 form.members.data = department.members
@@ -214,8 +259,8 @@ def edit_department(id):
         else:
             abort(404)
     if form.validate_on_submit():
-        department = db_sess.query(Department).filter(Jobs.id == id).first()
-        if department:
+        department = db_sess.query(Department).filter(Department.id == id).first()
+        if department and (department.chief == current_user.id or current_user.id == 1):
             department.title = form.title.data
             department.chief = form.chief.data
             department.members = form.members.data
@@ -227,12 +272,12 @@ def edit_department(id):
     return render_template('department.html', title='Редактирование департамента', form=form)
 
 
-@app.route('/departments_delete/<int:id>', methods=['GET', 'POST'])
+@blueprint.route('/departments_delete/<int:id>', methods=['GET', 'POST'])
 @login_required
 def departments_delete(id):
     db_sess = db_session.create_session()
     department = db_sess.query(Department).filter(Department.id == id).first()
-    if department and (Department.user == current_user or current_user.id == 1):
+    if department and (department.chief == current_user.id or current_user.id == 1):
         db_sess.delete(department)
         db_sess.commit()
     else:
@@ -240,13 +285,13 @@ def departments_delete(id):
     return redirect('/departments')
 
 
-@app.route('/training/<prof>')
+@blueprint.route('/training/<prof>')
 def traning(prof):
     return render_template('training.html', prof=prof, title="Тренировки в полёте")
 
 
-@app.route('/list_prof')
-@app.route('/list_prof/<list>')
+@blueprint.route('/list_prof')
+@blueprint.route('/list_prof/<list>')
 def list_prof(list='ol'):
     professions = ['инженер-исследователь', 'пилот', 'строитель', 'экзобиолог', 'врач',
                    'инженер по терраформированию', 'климатолог', 'специалист по радиационной защите',
@@ -256,8 +301,8 @@ def list_prof(list='ol'):
                            title="Список профессий")
 
 
-@app.route('/answer')
-@app.route('/auto_answer')
+@blueprint.route('/answer')
+@blueprint.route('/auto_answer')
 def answer():
     param = {
         'title': 'Автоматический ответ',
@@ -272,7 +317,7 @@ def answer():
     return render_template('auto_answer.html', **param)
 
 
-# @app.route('/login', methods=['POST', 'GET'])
+# @blueprint.route('/login', methods=['POST', 'GET'])
 # def login():
 #     form = LoginForm()
 #     if form.validate_on_submit():
@@ -280,303 +325,70 @@ def answer():
 #     return render_template('login.html', title='Авторизация', form=form)
 
 
-@app.route('/promotion')
+@blueprint.route('/promotion')
 def promotion():
-    a = ["Человечество вырастает из детства.</p>",
-         "Человечеству мала одна планета.</p>",
-         "Мы сделаем обитаемыми безжизненные пока планеты.</p>",
-         "И начнем с Марса!</p>",
-         "Присоединяйся!</p>"]
-    return f"""<!doctype html>
-                <html lang="en">
-                  <head>
-                    <meta charset="utf-8">
-                    <title>Рекламная кампания</title>
-                  </head>
-                  <body>
-                    <h2>{'<p>'.join(a)}</h2>
-                  </body>
-                </html>"""
-
-
-@app.route('/image_mars')
+    return promotion_page.response()
+
+
+@blueprint.route('/image_mars')
 def image_mars():
-    return f"""<!doctype html>
-                    <html lang="en">
-                      <head>
-                        <meta charset="utf-8">
-                        <title>Привет, Марс!</title>
-                      </head>
-                      <body>
-                        <h1>Жди нас, Марс!</h1>
-                        <img src="{url_for('static', filename='img/mars.png')}" 
-                            alt="здесь должна была быть картинка, но не нашлась">
-                        <p>Вот она какая, красная планета.</p>
-                      </body>
-                    </html>"""
-
-
-@app.route('/galery', methods=['POST', 'GET'])
+    return render_template('image_mars.html')
+
+
+@blueprint.route('/galery', methods=['POST', 'GET'])
 def galery():
-    photoes = ['static/img/mars2.jpg',
-               'static/img/mars3.jpg']
-    active = 'static/img/mars1.jpg'
+    photoes = ['img/mars2.jpg',
+               'img/mars3.jpg']
+    active = 'img/mars1.jpg'
     if request.method == 'GET':
         return render_template('galery.html', title='Галерея', active=active, photoes=photoes)
     if request.method == 'POST':
-        from io import BytesIO
-        a = BytesIO(request.files['img'].read())
-        from base64 import b64encode
-
-        # Получаем байты из объекта BytesIO и кодируем их в base64
-        img_data = a.getvalue()
-        img_base64 = b64encode(img_data).decode('utf-8')
-        # Выводим изображение на HTML страницу
-        html = img_base64
-        return render_template('galery.html', title='Галерея', active=active, photoes=photoes, html=html)
+        try:
+            image = receive_image()
+        except uploads.UploadError as error:
+            return render_template('galery.html', title='Галерея', active=active, photoes=photoes,
+                                   message=str(error))
+        return render_template('galery.html', title='Галерея', active=active, photoes=photoes, image=image)
+
+
+def receive_image():
+    # размер тела ограничен до разбора формы, сам файл пишется на диск кусками
+    max_size = current_app.config['UPLOAD_MAX_SIZE']
+    request.max_content_length = max_size + 64 * 1024  # запас на остальные поля формы
+    try:
+        storage = request.files.get('img')
+    except RequestEntityTooLarge:
+        raise uploads.UploadError(f'Файл больше {max_size // (1024 * 1024)} МБ')
+    name = uploads.save_image(storage, current_app.config['UPLOAD_FOLDER'], max_size)
+    return f'uploads/{name}'  # путь внутри static
+
+
+@blueprint.route('/carousel', methods=['POST', 'GET'])
+def carousel():
+    return render_template('carousel.html', photoes=['img/mars1.jpg', 'img/mars2.jpg', 'img/mars3.jpg'])
 
 
-@app.route('/carousel', methods=['POST', 'GET'])
-def carousel():
-    return f"""<!doctype html>
-                        <html lang="en">
-                          <head>
-                            <meta charset="utf-8">
-                            <link rel="stylesheet"
-                            href="https://cdn.jsdelivr.net/npm/bootstrap@5.2.3/dist/css/bootstrap.min.css"
-                            integrity="sha384-rbsA2VBKQhggwzxH7pPCaAqO46MgnOM80zW1RWuH61DGLwZJEdK2Kadq2F9CUG65"
-                            crossorigin="anonymous">
-                            <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.0.2/dist/js/bootstrap.bundle.min.js" 
-                            integrity="sha384-MrcW6ZMFYlzcLA8Nl+NtUVF0sA7MsXsP1UyJoMp4YLEuNSfAP+JcXn/tWtIaxVXM" 
-                            crossorigin="anonymous"></script>
-                            <title>Пейзажи Марса</title>
-                          </head>
-                          <body>
-                            <h1 align="center">Пейзажи Марса</h1>
-                            <div id="carouselExampleControls" class="carousel slide" data-bs-ride="true">
-                             <div class="carousel-inner">
-                                <div class="carousel-item active">
-                                  <img src="static/img/mars1.jpg" class="d-block w-100"
-                                  height = "1000"
-                                  alt="здесь должна была быть картинка, но не нашлась">
-                                </div>
-                                <div class="carousel-item">
-                                  <img src="static/img/mars2.jpg" class="d-block w-100" 
-                                  height = "1000"
-                                  alt="здесь должна была быть картинка, но не нашлась">
-                                </div>
-                                <div class="carousel-item">
-                                  <img src="static/img/mars3.jpg" class="d-block w-100"
-                                  height = "1000"
-                                  alt="здесь должна была быть картинка, но не нашлась">
-                                </div>
-                              </div>
-                              <button class="carousel-control-prev" type="button" data-bs-target="#carouselExampleControls" data-bs-slide="prev">
-                                <span class="carousel-control-prev-icon" aria-hidden="true"></span>
-                                <span class="visually-hidden">Previous</span>
-                              </button>
-                              <button class="carousel-control-next" type="button" data-bs-target="#carouselExampleControls" data-bs-slide="next">
-                                <span class="carousel-control-next-icon" aria-hidden="true"></span>
-                                <span class="visually-hidden">Next</span>
-                              </button>
-                            </div>
-                          </body>
-                        </html>"""
-
-
-@app.route('/load_photo', methods=['POST', 'GET'])
+@blueprint.route('/load_photo', methods=['POST', 'GET'])
 def load_image():
     if request.method == 'GET':
-        return f"""<!doctype html>
-                                <html lang="en">
-                                  <head>
-                                    <meta charset="utf-8">
-                                    <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">
-                                    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.2.3/dist/css/bootstrap.min.css" rel="stylesheet" integrity="sha384-rbsA2VBKQhggwzxH7pPCaAqO46MgnOM80zW1RWuH61DGLwZJEdK2Kadq2F9CUG65" crossorigin="anonymous">
-                                    <link rel="stylesheet" type="text/css" href="static/css/style.css" />
-                                    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.2.3/dist/js/bootstrap.bundle.min.js" integrity="sha384-kenU1KFdBIe4zVF0s0G1M5b4hcpxyD9F7jL+jjXkk+Q2h455rYXK/7HAuoJl+0I4" crossorigin="anonymous"></script>
-                                    <title>Загрузка фотографии</title>
-                                  </head>
-                                  <body>
-                                    <h1 align="center">Загрузка фотографии</h1>
-                                    <h2 align="center">для участи в миссии</h2>
-                                    <div>
-                                        <form class="img_form" form method="post" enctype="multipart/form-data">
-                                            <div class="form-group">
-                                                <label for="photo">Загрузите фотографию</label>
-                                                <input type="file" class="form-control-file" id="photo" name="img">
-                                            </div>
-                                            <br>
-                                            <button type="submit" class="btn btn-primary">Отправить</button>
-                                         </form>
-                                    </div>
-                                  </body>
-                                </html>"""
+        return load_photo_page.response()
     if request.method == 'POST':
-        from io import BytesIO
-        a = BytesIO(request.files['img'].read())
-        from base64 import b64encode
-
-        # Получаем байты из объекта BytesIO и кодируем их в base64
-        img_data = a.getvalue()
-        img_base64 = b64encode(img_data).decode('utf-8')
-        # Выводим изображение на HTML страницу
-        html = f'<img src="data:image/jpeg;base64,{img_base64}"/>'
-        return f"""<!doctype html>
-                        <html lang="en">
-                          <head>
-                            <meta charset="utf-8">
-                            <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">
-                            <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.2.3/dist/css/bootstrap.min.css" rel="stylesheet" integrity="sha384-rbsA2VBKQhggwzxH7pPCaAqO46MgnOM80zW1RWuH61DGLwZJEdK2Kadq2F9CUG65" crossorigin="anonymous">
-                            <link rel="stylesheet" type="text/css" href="static/css/style.css" />
-                            <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.2.3/dist/js/bootstrap.bundle.min.js" integrity="sha384-kenU1KFdBIe4zVF0s0G1M5b4hcpxyD9F7jL+jjXkk+Q2h455rYXK/7HAuoJl+0I4" crossorigin="anonymous"></script>
-                            <title>Загрузка фотографии</title>
-                          </head>
-                          <body>
-                            <h1 align="center">Загрузка фотографии</h1>
-                            <h2 align="center">для участи в миссии</h2>
-                            <div>
-                                <form class="img_form" method="post" enctype="multipart/form-data">
-                                    <div class="form-group">
-                                        <label for="photo">Загрузите фотографию</label>
-                                        <input type="file" class="form-control-file" id="photo" name="img">
-                                    </div>
-                                    <br>
-                                    {html}
-                                    <br>
-                                    <button type="submit" class="btn btn-primary">Отправить</button>
-                                 </form>
-                            </div>
-                          </body>
-                        </html>"""
-
-
-@app.route('/promotion_image')
+        try:
+            image = receive_image()
+        except uploads.UploadError as error:
+            return render_template('load_photo.html', message=str(error))
+        return render_template('load_photo.html', image=image)
+
+
+@blueprint.route('/promotion_image')
 def promotion_image():
-    return f"""<!doctype html>
-                    <html lang="en">
-                      <head>
-                        <meta charset="utf-8">
-                        <link rel="stylesheet" type="text/css" href="{url_for('static', filename='css/style.css')}" />
-                        <link rel="stylesheet"
-                        href="https://cdn.jsdelivr.net/npm/bootstrap@5.0.0-beta1/dist/css/bootstrap.min.css"
-                        integrity="sha384-giJF6kkoqNQ00vy+HMDP7azOuL0xtbfIcaT9wjKHr8RbDVddVHyTfAAsrekwKmP1"
-                        crossorigin="anonymous">
-                        <title>Реклама с картинкой</title>
-                      </head>
-                      <body>
-                        <h1>Жди нас, Марс!</h1>
-                        <img src="{url_for('static', filename='img/mars.png')}" 
-                            width="300" height="300" 
-                            alt="здесь должна была быть картинка, но не нашлась">
-                        <div class="alert alert-secondary" role="alert">Человечество вырастает из детства.</div>
-                        <div class="alert alert-success" role="alert">Человечеству мала одна планета.</div>
-                        <div class="alert alert-secondary" role="alert">Мы сделаем обитаемыми безжизненные пока планеты.</div>
-                        <div class="alert alert-warning" role="alert">И начнем с Марса!</div>
-                        <div class="alert alert-danger" role="alert">Присоединяйся!</div>
-                      </body>
-                    </html>"""
-
-
-@app.route('/form_sample', methods=['POST', 'GET'])
+    return render_template('promotion_image.html')
+
+
+@blueprint.route('/form_sample', methods=['POST', 'GET'])
 def form_sample():
     if request.method == 'GET':
-        return f'''<!doctype html>
-                        <html lang="en">
-                          <head>
-                            <meta charset="utf-8">
-                            <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">
-                            <link rel="stylesheet"
-                            href="https://cdn.jsdelivr.net/npm/bootstrap@5.0.0-beta1/dist/css/bootstrap.min.css"
-                            integrity="sha384-giJF6kkoqNQ00vy+HMDP7azOuL0xtbfIcaT9wjKHr8RbDVddVHyTfAAsrekwKmP1"
-                            crossorigin="anonymous">
-                            <link rel="stylesheet" type="text/css" href="{url_for('static', filename='css/style.css')}" />
-                            <title>Отбор астронавтов</title>
-                          </head>
-                          <body>
-                            <h1 align="center">Анкета претендента</h1>
-                            <h2 align="center">на участие в миссии</h2>
-                            <div>
-                                <form class="login_form" method="post">
-                                    <input type="text" class="form-control" id="email" aria-describedby="emailHelp" placeholder="Введите фамилию" name="surname">
-                                    <input type="text" class="form-control" id="password" placeholder="Введите имя" name="name">
-                                    <p></p>
-                                    <input type="email" class="form-control" id="email" aria-describedby="emailHelp" placeholder="Введите адрес почты" name="email">
-                                    <div class="form-group">
-                                        <label for="educationSelect">Какое у Вас образование</label>
-                                        <select class="form-control" id="educationSelect" name="education">
-                                          <option>Начальное</option>
-                                          <option>Основное</option>
-                                          <option>Среднее</option>
-                                          <option>Среднее профессиональное</option>
-                                          <option>Высшее</option>
-                                        </select>
-                                    </div>
-                                    <div class="form-group">
-                                        <label for="professionSelect">Какие у Вас профессии</label>
-                                        <div>
-                                            <input type="checkbox" id="in-is" name="in-is" checked>
-                                            <label for="in-is">Инженер-исследователь</label>
-                                        </div>
-
-                                        <div>
-                                          <input type="checkbox" id="pilot" name="pilot">
-                                          <label for="pilot">Пилот</label>
-                                        </div>
-
-                                        <div>
-                                          <input type="checkbox" id="climat" name="climat">
-                                          <label for="climat">Климатолог</label>
-                                        </div>
-
-                                        <div>
-                                          <input type="checkbox" id="doctor" name="doctor">
-                                          <label for="doctor">Врач</label>
-                                        </div>
-
-                                        <div>
-                                          <input type="checkbox" id="builder" name="builder">
-                                          <label for="builder">Строитель</label>
-                                        </div>
-
-                                        <div>
-                                          <input type="checkbox" id="exobio" name="exobio">
-                                          <label for="exobio">Экзобиолог</label>
-                                        </div>
-                                    </div>
-                                    <div class="form-group">
-                                        <label for="form-check">Укажите пол</label>
-                                        <div class="form-check">
-                                          <input class="form-check-input" type="radio" name="sex" id="male" value="male" checked>
-                                          <label class="form-check-label" for="male">
-                                            Мужской
-                                          </label>
-                                        </div>
-                                        <div class="form-check">
-                                          <input class="form-check-input" type="radio" name="sex" id="female" value="female">
-                                          <label class="form-check-label" for="female">
-                                            Женский
-                                          </label>
-                                        </div>
-                                    </div>
-                                    <div class="form-group">
-                                        <label for="quest">Почему вы хотите принять участие в миссии?</label>
-                                        <textarea class="form-control" id="quest" rows="3" name="quest"></textarea>
-                                    </div>
-                                    <div class="form-group">
-                                        <label for="photo">Приложите фотографию</label>
-                                        <input type="file" class="form-control-file" id="photo" name="file">
-                                    </div>
-
-                                    <div class="form-group form-check">
-                                        <input type="checkbox" class="form-check-input" id="acceptRules" name="accept">
-                                        <label class="form-check-label" for="acceptRules">Готовы ли остаться на Марсе?</label>
-                                    </div>
-                                    <button type="submit" class="btn btn-primary">Записаться</button>
-                                </form>
-                            </div>
-                          </body>
-                        </html>'''
+        return form_sample_page.response()
     elif request.method == 'POST':
         print(request.form.get('surname'))
         print(request.form.get('name'))
@@ -595,72 +407,68 @@ def form_sample():
         return "<h1>Форма отправлена<h1>"
 
 
-def user_create():
-    session = db_session.create_session()
-
-    user = User(surname='Scott',
-                name='Ridley',
-                age=21,
-                position='captain',
-                speciality='research engineer',
-                address='module_1',
-                email='scott_chief@mars.org')
-    session.add(user)
-    session.commit()
-
-    user = User(surname='Harry',
-                name='Potter',
-                age=14,
-                position='magl',
-                speciality='engineer',
-                address='module_1',
-                email='harry@mars.org')
-    session.add(user)
-
-    user = User(surname='Joe',
-                name='Biden',
-                age=60,
-                position='prezident',
-                speciality='biolog',
-                address='module_2',
-                email='biden@mars.org')
-    session.add(user)
-
-    user = User(surname='Mark',
-                name='Twen',
-                age=45,
-                position='writer',
-                speciality='coocker',
-                address='module_3',
-                email='twen@mars.org')
-    session.add(user)
-
-
-def jobs_create():
-    session = db_session.create_session()
-
-    job = Jobs(team_leader=1,
-               job='deployment of residential modules 1 and 2',
-               work_size=15,
-               collaborators='2, 3',
-               is_finished=False,
-               )
-    session.add(job)
-
-    job = Jobs(team_leader=1,
-               job='cleaning of modules 1 and 2',
-               work_size=20,
-               collaborators='1, 4',
-               is_finished=False,
-               )
-    session.add(job)
+def create_app(**config):
+    # фабрика приложения для app.run, wsgi.py (gunicorn), asgi.py (uvicorn) и
+    # замеров; config переопределяет настройки по умолчанию. Подключение к
+    # базе, пулы и кеши модулей data - одни на процесс, поэтому DB_FILE у всех
+    # приложений процесса должен совпадать
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'yandexlyceum_secret_key'
+    app.config['JOBS_PAGE_SIZE'] = 20
+    app.config['DB_PROFILE'] = os.environ.get('MARS_DB_PROFILE', 'concurrent')
+    # путь к файлу SQLite для кеша пользователей, общего для процессов; пусто - кеш в памяти
+    app.config['USER_CACHE'] = os.environ.get('MARS_USER_CACHE')
+    app.config['USER_CACHE_TTL'] = 300
+    app.config['PASSWORD_METHOD'] = os.environ.get('MARS_PASSWORD_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_WORKERS'] = int(os.environ.get('MARS_PASSWORD_WORKERS', os.cpu_count() or 1))
+    app.config['PASSWORD_MAX_PENDING'] = 64
+    app.config['DB_FILE'] = os.environ.get('MARS_DB', 'db/blogs.db')
+    # загруженные фотографии раздаются как обычная статика
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.static_folder, 'uploads')
+    app.config['UPLOAD_MAX_SIZE'] = int(os.environ.get('MARS_UPLOAD_MAX_SIZE', uploads.DEFAULT_MAX_SIZE))
+    # уменьшенные копии картинок в static/derived, общий размер с вытеснением LRU
+    app.config['IMAGE_CACHE_MAX_SIZE'] = int(os.environ.get('MARS_IMAGE_CACHE_MAX_SIZE',
+                                                            images.DEFAULT_MAX_SIZE))
+    app.config['IMAGE_WORKERS'] = int(os.environ.get('MARS_IMAGE_WORKERS', 2))
+    # заголовок Server-Timing с временем приложения, базы и шаблонов
+    app.config['SERVER_TIMING'] = os.environ.get('MARS_SERVER_TIMING') == '1'
+    # журнал медленных запросов с планами; пустой MARS_SLOW_QUERY_LOG выключает его
+    app.config['SLOW_QUERY_LOG'] = os.environ.get('MARS_SLOW_QUERY_LOG', 'logs/slow_queries.log')
+    app.config['SLOW_QUERY_THRESHOLD'] = float(os.environ.get('MARS_SLOW_QUERY_MS', 100)) / 1000  # секунд
+    app.config.update(config)
+
+    app.jinja_env.globals['picture'] = images.picture
+    # скомпилированные шаблоны сохраняются между запусками и рабочими процессами
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+    assets.init_app(app)
+    login_manager.init_app(app)
+    # до db_session: время запроса в метриках включает commit сессии
+    metrics.init_app(app)
+    db_session.init_app(app)
+    query_budget.init_app(app)
+    slow_queries.init_app(app)
+    compression.init_app(app)
+
+    api = Api(app)
+    api.add_resource(users_resource.UsersListResource, '/api/v2/users')
+    api.add_resource(users_resource.UsersExportResource, '/api/v2/users/export')
+    api.add_resource(users_resource.UsersChoicesResource, '/api/v2/users/choices')
+    api.add_resource(users_resource.UsersResource, '/api/v2/users/<int:users_id>')
+    app.register_blueprint(blueprint)
+    app.register_blueprint(jobs_api.blueprint)
+    app.register_blueprint(search_api.blueprint)
 
-    session.commit()
+    db_session.global_init(app.config['DB_FILE'], app.config['DB_PROFILE'])
+    user_cache.configure(app.config['USER_CACHE'], ttl=app.config['USER_CACHE_TTL'])
+    passwords.configure(app.config['PASSWORD_METHOD'], app.config['PASSWORD_WORKERS'],
+                        app.config['PASSWORD_MAX_PENDING'])
+    images.configure(app.static_folder, max_size=app.config['IMAGE_CACHE_MAX_SIZE'],
+                     workers=app.config['IMAGE_WORKERS'])
+    slow_queries.configure(app.config['SLOW_QUERY_LOG'], app.config['SLOW_QUERY_THRESHOLD'])
+    render_all(app, [promotion_page, load_photo_page, form_sample_page])
+    return app
 
 
 if __name__ == '__main__':
-    db_session.global_init("db/blogs.db")
-    # user_create()
-    # jobs_create()
-    app.register_blueprint(jobs_api.blueprint)
-    app.run(port=8080, host='127.0.0.1')
+    # тестовые данные: python -m data.seed --users 1000 --jobs 20000
+    create_app().run(port=8080, host='127.0.0.1')
@@ -0,0 +1,25 @@
+// Поля выбора пользователя с атрибутом data-typeahead: вместо тысяч <option>
+// варианты подгружаются с сервера по введённой части имени.
+document.querySelectorAll('select[data-typeahead]').forEach(function (select) {
+    var input = document.createElement('input');
+    input.type = 'search';
+    input.className = 'form-control';
+    input.placeholder = 'Начните вводить имя';
+    select.parentNode.insertBefore(input, select);
+
+    var timer = null;
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            var url = select.dataset.typeahead + '?q=' + encodeURIComponent(input.value);
+            fetch(url).then(function (response) {
+                return response.json();
+            }).then(function (data) {
+                select.innerHTML = '';
+                data.users.forEach(function (user) {
+                    select.add(new Option(user.name + ' (id ' + user.id + ')', user.id));
+                });
+            });
+        }, 250);
+    });
+});